@@ -1,15 +1,60 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import bisect
 import collections
 import os
 import sqlite3
 
 import pkg_resources
 
+from git_code_debt.util.time import period_end
+from git_code_debt.util.time import period_start
+
 Metric = collections.namedtuple('Metric', ('value', 'date'))
 MetricInfo = collections.namedtuple('MetricInfo', ('id', 'description'))
 
+# Stores the running value of every metric with data for every commit
+STORAGE_FULL = 'full'
+# Only stores a running value when the metric changes, commits are recorded
+# in the `commits` table
+STORAGE_SPARSE = 'sparse'
+# Only stores `metric_changes` and a `metric_snapshots` of every value every
+# so many commits, commits are recorded in the `commits` table
+STORAGE_SNAPSHOT = 'snapshot'
+STORAGE_MODES = (STORAGE_FULL, STORAGE_SPARSE, STORAGE_SNAPSHOT)
+
+
+def get_migrations():
+    """Gets (version, filename) for each schema migration, in order."""
+    migrations_dir = pkg_resources.resource_filename(
+        'git_code_debt', 'schema/migrations',
+    )
+    return sorted(
+        (int(sql_file.partition('_')[0]), os.path.join(migrations_dir, sql_file))
+        for sql_file in os.listdir(migrations_dir)
+        if sql_file.endswith('.sql')
+    )
+
+
+def _metrics_for_dates(rows, dates):
+    """Finds the latest row before each of the dates.
+
+    Args:
+       rows - (timestamp, running_value) sorted by timestamp, a running_value
+              of None is treated as having no data
+       dates - Timestamps to find the latest row before
+    """
+    timestamps = [timestamp for timestamp, _ in rows]
+
+    def get_metric_for_timestamp(timestamp):
+        i = bisect.bisect_left(timestamps, timestamp)
+        if i and rows[i - 1][1] is not None:
+            return Metric(rows[i - 1][1], rows[i - 1][0])
+        else:
+            return Metric(0, timestamp)
+    return [get_metric_for_timestamp(date) for date in dates]
+
 
 class DatabaseLogic:
 
@@ -23,6 +68,7 @@ class DatabaseLogic:
 
     def __init__(self, db):
         self._db = db
+        self._storage_mode = None
 
     def __enter__(self):
         self._db.__enter__()
@@ -40,6 +86,153 @@ class DatabaseLogic:
     def _fetch_all(self, sql, values=tuple()):
         return self._db.execute(sql, values).fetchall()
 
+    def _iter_all(self, sql, values=tuple()):
+        return iter(self._db.execute(sql, values))
+
+    @property
+    def storage_mode(self):
+        """The storage mode the database was created with.  Databases which
+        predate the `metadata` table store every value.
+        """
+        if self._storage_mode is None:
+            storage_mode = self._get_metadata('storage_mode')
+            self._storage_mode = storage_mode or STORAGE_FULL
+        return self._storage_mode
+
+    def _get_metadata(self, key):
+        # The table may not exist until the database is migrated
+        has_metadata = self._fetch_one(
+            "SELECT 1 FROM sqlite_master\n"
+            "WHERE type = 'table' AND name = 'metadata'\n",
+        )
+        result = has_metadata and self._fetch_one(
+            'SELECT value FROM metadata WHERE key = ?', (key,),
+        )
+        return result[0] if result else None
+
+    @property
+    def _commits_table(self):
+        # A table with a row per commit (in commit order) with a timestamp
+        if self.storage_mode == STORAGE_FULL:
+            return 'metric_data'
+        else:
+            return 'commits'
+
+    def _get_commit_id(self, sha):
+        result = self._fetch_one('SELECT id FROM commits WHERE sha = ?', (sha,))
+        return result[0] if result else None
+
+    def _get_sparse_values(self, sha):
+        """Gets (metric_id, name, running_value) for each metric with data at
+        `sha` using the latest `metric_data` row at or before that commit.
+        """
+        # Rows are inserted in commit order so the ROWID of the last row at or
+        # before the commit bounds the rows which apply to it.
+        bound, = self._fetch_one(
+            '\n'.join((
+                'SELECT MAX(metric_data.ROWID)',
+                'FROM metric_data',
+                'WHERE metric_data.sha = (',
+                '    SELECT commits.sha',
+                '    FROM commits',
+                '    WHERE',
+                '        commits.id <= (SELECT id FROM commits WHERE sha = ?) AND',
+                '        EXISTS (',
+                '            SELECT 1 FROM metric_data',
+                '            WHERE metric_data.sha = commits.sha',
+                '        )',
+                '    ORDER BY commits.id DESC',
+                '    LIMIT 1',
+                ')',
+            )),
+            (sha,),
+        )
+        if bound is None:
+            return []
+
+        results = self._fetch_all(
+            '\n'.join((
+                'SELECT',
+                '    metric_names.id,',
+                '    metric_names.name,',
+                '    (',
+                '        SELECT metric_data.running_value',
+                '        FROM metric_data',
+                '        WHERE',
+                '            metric_data.metric_id = metric_names.id AND',
+                '            metric_data.ROWID <= ?',
+                '        ORDER BY metric_data.ROWID DESC',
+                '        LIMIT 1',
+                '    )',
+                'FROM metric_names',
+            )),
+            (bound,),
+        )
+        return [row for row in results if row[2] is not None]
+
+    def _get_snapshot_values(self, commit_id, metric_id=None):
+        """Gets (metric_id, name, running_value) for each metric with data at
+        the commit by applying `metric_changes` to the nearest snapshot.
+
+        Args:
+           commit_id - The id of the commit in the `commits` table
+           metric_id - (optional) Only get the value for this metric
+        """
+        if commit_id is None:
+            return []
+
+        snapshot_id, = self._fetch_one(
+            'SELECT COALESCE(MAX(commit_id), 0)\n'
+            'FROM metric_snapshots\n'
+            'WHERE commit_id <= ?\n',
+            (commit_id,),
+        )
+
+        if metric_id is None:
+            metric_filter, metric_values = '', ()
+        else:
+            metric_filter, metric_values = ' AND metric_id = ?', (metric_id,)
+
+        return self._fetch_all(
+            '\n'.join((
+                'SELECT',
+                '    metric_names.id,',
+                '    metric_names.name,',
+                '    SUM(deltas.value)',
+                'FROM (',
+                '    SELECT metric_id, running_value AS value',
+                '    FROM metric_snapshots',
+                '    WHERE commit_id = ?' + metric_filter,
+                '    UNION ALL',
+                '    SELECT metric_changes.metric_id, metric_changes.value',
+                '    FROM commits',
+                '    INNER JOIN metric_changes ON metric_changes.sha = commits.sha',
+                '    WHERE commits.id > ? AND commits.id <= ?' + metric_filter,
+                ') AS deltas',
+                'INNER JOIN metric_names ON metric_names.id = deltas.metric_id',
+                'GROUP BY metric_names.id',
+            )),
+            (
+                (snapshot_id,) + metric_values +
+                (snapshot_id, commit_id) + metric_values
+            ),
+        )
+
+    def _get_values(self, sha):
+        if self.storage_mode == STORAGE_SPARSE:
+            return self._get_sparse_values(sha)
+        else:
+            return self._get_snapshot_values(self._get_commit_id(sha))
+
+    def get_schema_version(self):
+        """Gets the version of the last migration applied."""
+        version, = self._fetch_one('PRAGMA user_version')
+        return version
+
+    def is_schema_outdated(self):
+        """Whether migrations remain to be applied (by generate)."""
+        return self.get_schema_version() < get_migrations()[-1][0]
+
     def get_metric_ids(self):
         query = 'SELECT name FROM metric_names WHERE has_data=1 ORDER BY name'
         res = self._fetch_all(query)
@@ -51,8 +244,8 @@ class DatabaseLogic:
         return MetricInfo(*res)
 
     def get_latest_sha(self):
-        query = 'SELECT sha FROM metric_data ORDER BY timestamp DESC LIMIT 1'
-        result = self._fetch_one(query)
+        query = 'SELECT sha FROM {} ORDER BY timestamp DESC LIMIT 1'
+        result = self._fetch_one(query.format(self._commits_table))
 
         # If there is no data result will be None
         return result[0] if result else None
@@ -62,12 +255,12 @@ class DatabaseLogic:
             '\n'.join((
                 'SELECT',
                 '    sha',
-                'FROM metric_data',
+                'FROM {}',
                 'WHERE',
                 '    timestamp <= ?',
                 'ORDER BY timestamp DESC',
                 'LIMIT 1',
-            )),
+            )).format(self._commits_table),
             [date],
         )
         # If the date is too far in the past (before data) there won't be a result
@@ -78,6 +271,11 @@ class DatabaseLogic:
         if not sha:
             return collections.defaultdict(int)
 
+        if self.storage_mode != STORAGE_FULL:
+            return collections.defaultdict(
+                int, ((name, value) for _, name, value in self._get_values(sha)),
+            )
+
         result = self._fetch_all(
             'SELECT\n'
             '    metric_names.name,\n'
@@ -92,28 +290,315 @@ class DatabaseLogic:
         )
         return collections.defaultdict(int, result)
 
-    def metrics_for_dates(self, metric_id, dates):
-        def get_metric_for_timestamp(timestamp):
-            result = self._fetch_one(
-                'SELECT running_value, timestamp\n'
-                'FROM metric_data\n'
-                'WHERE metric_id = ? AND timestamp < ?\n'
-                'ORDER BY timestamp DESC\n'
-                'LIMIT 1\n',
-                (metric_id, timestamp),
+    def _get_snapshot_series(self, metric_id, start, end):
+        first_commit_id, = self._fetch_one(
+            'SELECT MIN(commits.id)\n'
+            'FROM metric_changes\n'
+            'INNER JOIN commits ON commits.sha = metric_changes.sha\n'
+            'WHERE metric_changes.metric_id = ?\n',
+            (metric_id,),
+        )
+        # The latest commit before the start and every commit in the range
+        min_id, max_id = self._fetch_one(
+            '\n'.join((
+                'SELECT MIN(id), MAX(id)',
+                'FROM commits',
+                'WHERE',
+                '    timestamp >= COALESCE(',
+                '        (SELECT MAX(timestamp) FROM commits WHERE timestamp < ?),',
+                '        ?',
+                '    ) AND',
+                '    timestamp < ?',
+            )),
+            (start, start, end),
+        )
+        if first_commit_id is None or min_id is None:
+            return []
+
+        results = self._fetch_all(
+            '\n'.join((
+                'SELECT',
+                '    commits.id,',
+                '    commits.timestamp,',
+                '    COALESCE(metric_changes.value, 0)',
+                'FROM commits',
+                'LEFT OUTER JOIN metric_changes ON',
+                '    metric_changes.sha = commits.sha AND',
+                '    metric_changes.metric_id = ?',
+                'WHERE commits.id >= ? AND commits.id <= ?',
+                'ORDER BY commits.id',
+            )),
+            (metric_id, min_id, max_id),
+        )
+        value = sum(
+            value
+            for _, _, value in self._get_snapshot_values(min_id - 1, metric_id)
+        )
+        rows = []
+        for commit_id, timestamp, change in results:
+            value += change
+            # Before the metric had data
+            if commit_id < first_commit_id:
+                rows.append((timestamp, commit_id, None))
+            else:
+                rows.append((timestamp, commit_id, value))
+        rows.sort()
+        return [(ts, value) for ts, _, value in rows]
+
+    def _get_series(self, metric_id, start, end):
+        """Gets (timestamp, running_value) sorted by timestamp for the latest
+        row before `start` and every row from `start` until `end`.  A
+        running_value of None means the metric had no data yet.
+        """
+        if self.storage_mode == STORAGE_SNAPSHOT:
+            return self._get_snapshot_series(metric_id, start, end)
+
+        rows = self._fetch_all(
+            '\n'.join((
+                'SELECT * FROM (',
+                '    SELECT timestamp, ROWID, running_value',
+                '    FROM metric_data',
+                '    WHERE metric_id = ? AND timestamp < ?',
+                '    ORDER BY timestamp DESC, ROWID DESC',
+                '    LIMIT 1',
+                ')',
+                'UNION ALL',
+                'SELECT timestamp, ROWID, running_value',
+                'FROM metric_data',
+                'WHERE metric_id = ? AND timestamp >= ? AND timestamp < ?',
+                'ORDER BY 1, 2',
+            )),
+            (metric_id, start, metric_id, start, end),
+        )
+        return [(ts, value) for ts, _, value in rows]
+
+    def _get_raw_series(self, metric_id, start, end):
+        return [
+            Metric(value, timestamp)
+            for timestamp, value in self._get_series(metric_id, start, end)
+            if value is not None
+        ]
+
+    def _get_rollup_series(self, metric_id, start, end, period):
+        # The buckets partly outside of the range would include values from
+        # outside of it, the ends of the range are read from the raw data
+        rollup_start = period_start(period, start)
+        if rollup_start < start:
+            rollup_start = period_end(period, start)
+        rollup_end = period_start(period, end)
+        if rollup_start >= rollup_end:
+            return self._get_raw_series(metric_id, start, end)
+
+        # Starts with the latest value before `start`
+        ret = self._get_raw_series(metric_id, start, rollup_start)
+        rows = self._fetch_all(
+            '\n'.join((
+                'SELECT bucket, min_value, max_value, running_value',
+                'FROM metric_rollups',
+                'WHERE',
+                '    period = ? AND metric_id = ? AND bucket >= ? AND bucket < ?',
+                'ORDER BY bucket',
+            )),
+            (period, metric_id, rollup_start, rollup_end),
+        )
+        for bucket, min_value, max_value, running_value in rows:
+            bucket_end = period_end(period, bucket)
+            # When in the bucket the minimum and maximum were reached is not
+            # stored, the value at the end of the bucket is the running value
+            middle = (bucket + bucket_end) // 2
+            ret.extend((
+                Metric(min_value, middle),
+                Metric(max_value, middle),
+                Metric(running_value, bucket_end - 1),
+            ))
+        ret.extend(
+            metric
+            for metric in self._get_raw_series(metric_id, rollup_end, end)
+            if metric.date >= rollup_end
+        )
+        return ret
+
+    def get_metric_series(self, metric_id, start, end, period=None):
+        """Gets the values of a metric from `start` until `end` in one scan,
+        starting with the latest value before `start`.
+
+        Args:
+           metric_id - The id of the metric
+           start - Timestamp of the start of the range
+           end - Timestamp of the end of the range (exclusive)
+           period - (optional) Read the minimum, maximum and last value of
+                    each `metric_rollups` bucket of this period inside the
+                    range instead of each value
+        """
+        if period is not None:
+            return self._get_rollup_series(metric_id, start, end, period)
+        else:
+            return self._get_raw_series(metric_id, start, end)
+
+    def _value_at_sha_sql(self, sha_sql):
+        """Gets an SQL expression for the value of the `metric_names` row's
+        metric at a commit (NULL if the metric had no data).
+
+        Args:
+           sha_sql - An SQL expression for the sha of the commit
+        """
+        if self.storage_mode == STORAGE_FULL:
+            return '\n'.join((
+                '(',
+                '    SELECT running_value',
+                '    FROM metric_data',
+                '    WHERE',
+                '        metric_data.metric_id = metric_names.id AND',
+                '        metric_data.sha = {sha}',
+                ')',
+            )).format(sha=sha_sql)
+        elif self.storage_mode == STORAGE_SPARSE:
+            # See `_get_sparse_values`
+            return '\n'.join((
+                '(',
+                '    SELECT running_value',
+                '    FROM metric_data',
+                '    WHERE',
+                '        metric_data.metric_id = metric_names.id AND',
+                '        metric_data.ROWID <= (',
+                '            SELECT MAX(bound.ROWID)',
+                '            FROM metric_data AS bound',
+                '            WHERE bound.sha = (',
+                '                SELECT commits.sha',
+                '                FROM commits',
+                '                WHERE',
+                '                    commits.id <= (',
+                '                        SELECT id FROM commits WHERE sha = {sha}',
+                '                    ) AND',
+                '                    EXISTS (',
+                '                        SELECT 1 FROM metric_data AS other',
+                '                        WHERE other.sha = commits.sha',
+                '                    )',
+                '                ORDER BY commits.id DESC',
+                '                LIMIT 1',
+                '            )',
+                '        )',
+                '    ORDER BY metric_data.ROWID DESC',
+                '    LIMIT 1',
+                ')',
+            )).format(sha=sha_sql)
+        else:
+            # See `_get_snapshot_values`
+            commit_id = '(SELECT id FROM commits WHERE sha = {})'.format(sha_sql)
+            snapshot_id = (
+                '(\n'
+                '    SELECT COALESCE(MAX(commit_id), 0)\n'
+                '    FROM metric_snapshots\n'
+                '    WHERE commit_id <= {}\n'
+                ')'
+            ).format(commit_id)
+            return '\n'.join((
+                '(',
+                '    SELECT SUM(deltas.value) FROM (',
+                '        SELECT running_value AS value',
+                '        FROM metric_snapshots',
+                '        WHERE',
+                '            metric_snapshots.commit_id = {snapshot_id} AND',
+                '            metric_snapshots.metric_id = metric_names.id',
+                '        UNION ALL',
+                '        SELECT metric_changes.value',
+                '        FROM commits',
+                '        INNER JOIN metric_changes ON',
+                '            metric_changes.sha = commits.sha',
+                '        WHERE',
+                '            commits.id > {snapshot_id} AND',
+                '            commits.id <= {commit_id} AND',
+                '            metric_changes.metric_id = metric_names.id',
+                '    ) AS deltas',
+                ')',
+            )).format(snapshot_id=snapshot_id, commit_id=commit_id)
+
+    def get_metrics_for_times(self, timestamps):
+        """Gets the value of every metric with data at each of the timestamps
+        in one query.
+
+        Args:
+           timestamps - A timestamp of None is the latest commit, otherwise
+                        the latest commit at or before the timestamp is used.
+        Returns a `defaultdict(int)` of metric name to value for each
+        timestamp.
+        """
+        columns = []
+        values = {}
+        for i, timestamp in enumerate(timestamps):
+            if timestamp is None:
+                columns.append(
+                    self._value_at_sha_sql(
+                        '(SELECT sha FROM {} ORDER BY timestamp DESC LIMIT 1)'
+                        .format(self._commits_table),
+                    ),
+                )
+            else:
+                columns.append(
+                    self._value_at_sha_sql(
+                        '(\n'
+                        '    SELECT sha FROM {}\n'
+                        '    WHERE timestamp <= :timestamp{}\n'
+                        '    ORDER BY timestamp DESC\n'
+                        '    LIMIT 1\n'
+                        ')'.format(self._commits_table, i),
+                    ),
+                )
+                values['timestamp{}'.format(i)] = timestamp
+
+        results = self._fetch_all(
+            'SELECT\n'
+            '    metric_names.name,\n' +
+            ',\n'.join(columns) + '\n'
+            'FROM metric_names\n'
+            'WHERE metric_names.has_data = 1\n',
+            values,
+        )
+        return [
+            collections.defaultdict(
+                int,
+                (
+                    (row[0], row[i])
+                    for row in results
+                    if row[i] is not None
+                ),
             )
-            return Metric(*result) if result else Metric(0, timestamp)
-        return [get_metric_for_timestamp(date) for date in dates]
+            for i in range(1, len(timestamps) + 1)
+        ]
+
+    def metrics_for_dates(self, metric_id, dates):
+        """Gets the latest value of a metric before each of the dates.
+
+        Args:
+           metric_id - The id of the metric
+           dates - Timestamps to get the metric at
+        """
+        if not dates:
+            return []
+        rows = self._get_series(metric_id, min(dates), max(dates))
+        return _metrics_for_dates(rows, dates)
 
     def get_first_data_timestamp(self, metric_name):
+        if self.storage_mode == STORAGE_SNAPSHOT:
+            first_timestamp = self._fetch_one(
+                'SELECT commits.timestamp\n'
+                'FROM metric_changes\n'
+                'INNER JOIN commits ON commits.sha = metric_changes.sha\n'
+                'INNER JOIN metric_names ON\n'
+                '    metric_names.id = metric_changes.metric_id\n'
+                'WHERE metric_names.name = ?\n'
+                'ORDER BY commits.id ASC\n'
+                'LIMIT 1\n',
+                (metric_name,),
+            )
+            return first_timestamp[0] if first_timestamp else 0
 
         # Find the first change for that metric
         first_timestamp = self._fetch_one(
             'SELECT timestamp\n'
             'FROM metric_data\n'
-            'INNER JOIN metric_names ON metric_names.id = metric_data.metric_id\n'
-            'WHERE metric_names.name = ?\n'
-            'ORDER BY metric_data.ROWID ASC\n'
+            'WHERE metric_id = (SELECT id FROM metric_names WHERE name = ?)\n'
+            'ORDER BY ROWID ASC\n'
             'LIMIT 1\n',
             (metric_name,),
         )
@@ -139,6 +624,25 @@ class DatabaseLogic:
     def get_major_changes_for_metric(
             self, start_timestamp, end_timestamp, metric_id,
     ):
+        if self.storage_mode == STORAGE_SNAPSHOT:
+            return self._fetch_all(
+                '\n'.join((
+                    'SELECT',
+                    '    commits.timestamp,',
+                    '    commits.sha,',
+                    '    metric_changes.value',
+                    'FROM metric_changes',
+                    'INNER JOIN commits ON commits.sha = metric_changes.sha',
+                    'WHERE',
+                    '    commits.timestamp >= ? AND',
+                    '    commits.timestamp < ? AND',
+                    '    metric_changes.metric_id = ?',
+                    'ORDER BY ABS(metric_changes.value) DESC',
+                    'LIMIT 50',
+                )),
+                (start_timestamp, end_timestamp, metric_id),
+            )
+
         return self._fetch_all(
             '\n'.join((
                 'SELECT',
@@ -169,43 +673,193 @@ class DatabaseLogic:
         return {k: bool(v) for k, v in res}
 
     def get_previous_sha(self):
-        """Gets the latest inserted SHA."""
+        """Gets the SHA generate stopped at, the latest inserted SHA when
+        there is no marker.
+        """
+        last_sha = self._get_metadata('last_sha')
+        if last_sha is not None:
+            return last_sha
         result = self._fetch_one(
             # Use ROWID as a free, auto-incrementing, primary key.
-            'SELECT sha FROM metric_data ORDER BY ROWID DESC LIMIT 1',
+            'SELECT sha FROM {} ORDER BY ROWID DESC LIMIT 1'.format(
+                self._commits_table,
+            ),
         )
         return result[0] if result else None
 
+    def iter_commits_newest_first(self):
+        """Yields (sha, timestamp) of the stored commits, newest first.  Rows
+        are read as they are consumed.
+        """
+        previous_sha = None
+        for sha, timestamp in self._iter_all(
+                'SELECT sha, timestamp FROM {} ORDER BY ROWID DESC'.format(
+                    self._commits_table,
+                ),
+        ):
+            # Full storage has a row per metric for each commit
+            if sha != previous_sha:
+                yield sha, timestamp
+                previous_sha = sha
+
+    def get_commit_count(self):
+        """Gets the number of commits in the `commits` table."""
+        # Commits are numbered from 1 in order
+        result, = self._fetch_one('SELECT MAX(id) FROM commits')
+        return result or 0
+
     def get_metric_values(self, sha):
         """Gets the metric values from a specific commit.
 
         :param db: Database object
         :param text sha: A sha representing a single commit
         """
+        if self.storage_mode != STORAGE_FULL:
+            return {
+                metric_id: value for metric_id, _, value in self._get_values(sha)
+            }
+
         results = self._fetch_all(
             'SELECT metric_id, running_value FROM metric_data WHERE sha = ?', (sha,),
         )
         return dict(results)
 
 
+INSERT_COMMIT_SQL = 'INSERT INTO commits (sha, timestamp) VALUES (?, ?)'
+INSERT_METRIC_SNAPSHOT_SQL = (
+    'INSERT INTO metric_snapshots (commit_id, metric_id, running_value)\n'
+    'SELECT id, ?, ? FROM commits WHERE sha = ?\n'
+)
+INSERT_ROLLUPS_SQL = (
+    'INSERT OR IGNORE INTO metric_rollups (\n'
+    '    period, bucket, metric_id, min_value, max_value, running_value\n'
+    ')\n'
+    'VALUES (?, ?, ?, ?, ?, ?)\n'
+)
+UPDATE_ROLLUPS_SQL = (
+    'UPDATE metric_rollups\n'
+    'SET\n'
+    '    min_value = MIN(min_value, ?),\n'
+    '    max_value = MAX(max_value, ?),\n'
+    '    running_value = ?\n'
+    'WHERE period = ? AND bucket = ? AND metric_id = ?\n'
+)
+# Buffered statements which read the rows of other buffered statements are
+# written after them, the rest are written in the order they were first used
+FLUSH_ORDER = (
+    INSERT_COMMIT_SQL,
+    INSERT_METRIC_SNAPSHOT_SQL,
+    INSERT_ROLLUPS_SQL,
+    UPDATE_ROLLUPS_SQL,
+)
+
+
+def _flush_order(sql):
+    if sql in FLUSH_ORDER:
+        return FLUSH_ORDER.index(sql)
+    else:
+        return len(FLUSH_ORDER)
+
+
 class WriteableDatabaseLogic(DatabaseLogic):
+    """Inserts are buffered and written with one `executemany` per statement
+    on `flush`, `commit`, before any other statement or query and when
+    leaving the context manager.
+    """
+
+    def __init__(self, db):
+        DatabaseLogic.__init__(self, db)
+        # Maps sql to the rows waiting to be written with it
+        self._pending = collections.OrderedDict()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._pending.clear()
+        return DatabaseLogic.__exit__(self, exc_type, exc_value, traceback)
+
+    def _fetch_one(self, sql, values=tuple()):
+        self.flush()
+        return DatabaseLogic._fetch_one(self, sql, values)
+
+    def _fetch_all(self, sql, values=tuple()):
+        self.flush()
+        return DatabaseLogic._fetch_all(self, sql, values)
+
+    def _iter_all(self, sql, values=tuple()):
+        self.flush()
+        return DatabaseLogic._iter_all(self, sql, values)
 
     def _executemany(self, sql, values):
-        self._db.executemany(sql, values)
+        self._pending.setdefault(sql, []).extend(values)
+
+    def flush(self):
+        """Writes all of the buffered rows, see `FLUSH_ORDER`."""
+        for sql in sorted(self._pending, key=_flush_order):
+            self._db.executemany(sql, self._pending[sql])
+        self._pending.clear()
+
+    def commit(self):
+        """Writes all of the buffered rows and commits the transaction."""
+        self.flush()
+        self._db.commit()
+
+    def set_pragma(self, name, value):
+        self._db.execute('PRAGMA {} = {}'.format(name, value))
 
     def _execute(self, sql, values):
+        self.flush()
         self._db.execute(sql, values)
 
+    def set_storage_mode(self, storage_mode):
+        self._execute(
+            'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+            ('storage_mode', storage_mode),
+        )
+        self._storage_mode = storage_mode
+
+    def checkpoint(self, sha):
+        """Commits the data up to and including `sha` and records that
+        generate should continue after it.
+        """
+        self._execute(
+            'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+            ('last_sha', sha),
+        )
+        self.commit()
+
+    def insert_commit(self, commit):
+        self._executemany(INSERT_COMMIT_SQL, [(commit.sha, commit.date)])
+
     def create_schema(self):
         """Creates the database schema."""
         schema_dir = pkg_resources.resource_filename('git_code_debt', 'schema')
         schema_files = os.listdir(schema_dir)
 
         for sql_file in schema_files:
+            if not sql_file.endswith('.sql'):
+                continue
             resource_filename = os.path.join(schema_dir, sql_file)
             with open(resource_filename, 'r') as resource:
                 self._db.executescript(resource.read())
 
+        self.migrate()
+
+    def migrate(self):
+        """Applies the schema migrations newer than the database's version.
+        Migrations are applied in place so existing databases do not need to
+        be regenerated.
+        """
+        version = self.get_schema_version()
+        for migration_version, resource_filename in get_migrations():
+            if migration_version <= version:
+                continue
+            with open(resource_filename, 'r') as resource:
+                self._db.executescript(resource.read())
+            self._db.execute('PRAGMA user_version = {}'.format(migration_version))
+            self._db.commit()
+
     def insert_metric_values(self, metric_values, has_data, commit):
         values = [
             (commit.sha, metric_id, commit.date, value)
@@ -218,28 +872,104 @@ class WriteableDatabaseLogic(DatabaseLogic):
             values,
         )
 
-    def update_has_data(self, metrics, metric_mapping, has_data):
+    def insert_metric_snapshot(self, metric_values, has_data, commit):
+        values = [
+            (metric_id, value, commit.sha)
+            for metric_id, value in metric_values.items()
+            if has_data[metric_id]
+        ]
+        self._executemany(INSERT_METRIC_SNAPSHOT_SQL, values)
+
+    def insert_rollups(self, rollups):
+        """Merges values into the `metric_rollups` buckets.
+
+        :param rollups: (period, bucket, metric_id, min, max, value) in order
+        """
+        self._executemany(INSERT_ROLLUPS_SQL, rollups)
+        # Applied in order so the last value wins
+        self._executemany(
+            UPDATE_ROLLUPS_SQL,
+            [
+                (min_value, max_value, value, period, bucket, metric_id)
+                for period, bucket, metric_id, min_value, max_value, value
+                in rollups
+            ],
+        )
+
+    def delete_commits_after(self, sha, rollup_buckets):
+        """Deletes the data of the commits after `sha` and the rollup
+        buckets they were part of.
+
+        :param sha: The last commit to keep (None to delete every commit)
+        :param dict rollup_buckets: Maps period to the first bucket to delete
+        """
+        if self.storage_mode == STORAGE_FULL:
+            bound, = self._fetch_one(
+                'SELECT MAX(ROWID) FROM metric_data WHERE sha = ?', (sha,),
+            )
+            deleted_shas = 'SELECT sha FROM metric_data WHERE ROWID > ?'
+        else:
+            bound = self._get_commit_id(sha)
+            deleted_shas = 'SELECT sha FROM commits WHERE id > ?'
+        bound = bound or 0
+
+        self._execute(
+            'DELETE FROM metric_changes WHERE sha IN ({})'.format(deleted_shas),
+            (bound,),
+        )
+        if self.storage_mode == STORAGE_FULL:
+            self._execute('DELETE FROM metric_data WHERE ROWID > ?', (bound,))
+        elif self.storage_mode == STORAGE_SPARSE:
+            self._execute(
+                'DELETE FROM metric_data WHERE sha IN ({})'.format(deleted_shas),
+                (bound,),
+            )
+        else:
+            self._execute(
+                'DELETE FROM metric_snapshots WHERE commit_id > ?', (bound,),
+            )
+        if self.storage_mode != STORAGE_FULL:
+            self._execute('DELETE FROM commits WHERE id > ?', (bound,))
+        # Continue from the last commit kept
+        self._execute("DELETE FROM metadata WHERE key = 'last_sha'", ())
+
+        for period, bucket in sorted(rollup_buckets.items()):
+            self._execute(
+                'DELETE FROM metric_rollups WHERE period = ? AND bucket >= ?',
+                (period, bucket),
+            )
+        # Metrics may only have had data in the deleted commits
+        self._execute(
+            'UPDATE metric_names SET has_data = EXISTS (\n'
+            '    SELECT 1 FROM metric_changes\n'
+            '    WHERE metric_changes.metric_id = metric_names.id\n'
+            ')\n',
+            (),
+        )
+
+    def update_has_data(self, metrics, has_data):
         query = 'UPDATE metric_names SET has_data=1 WHERE id = ?'
-        for metric_id in [metric_mapping[m.name] for m in metrics if m.value]:
+        values = []
+        for metric_id in [metric_id for metric_id, value in metrics if value]:
             if not has_data[metric_id]:
                 has_data[metric_id] = True
-                self._execute(query, (metric_id,))
+                values.append((metric_id,))
+        self._executemany(query, values)
 
     def insert_metrics_info(self, metrics_info):
         query = 'INSERT INTO metric_names (name, description) VALUES (?, ?)'
         self._executemany(query, metrics_info)
 
-    def insert_metric_changes(self, metrics, metric_mapping, commit):
+    def insert_metric_changes(self, metrics, commit):
         """Insert into the metric_changes tables.
 
-        :param metrics: `list` of `Metric` objects
-        :param dict metric_mapping: Maps metric names to ids
+        :param metrics: `list` of (metric_id, value)
         :param Commit commit:
         """
         values = [
-            [commit.sha, metric_mapping[metric.name], metric.value]
-            for metric in metrics
-            if metric.value != 0
+            [commit.sha, metric_id, value]
+            for metric_id, value in metrics
+            if value != 0
         ]
         self._executemany(
             'INSERT INTO metric_changes (sha, metric_id, value) VALUES (?, ?, ?)',
@@ -1,10 +1,14 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import array
 import collections
 import os.path
 import re
 
+import six
+from six.moves import collections_abc
+
 
 class Status(object):
     ADDED = object()
@@ -48,11 +52,78 @@ class FileDiffStat(
 
 SUBMODULE_MODE = b'160000'
 SYMLINK_MODE = b'120000'
+# 64 bit offsets ('l' is 32 bit on some platforms, 'q' is py3 only)
+OFFSETS_TYPECODE = str('q') if six.PY3 else str('l')
+
+
+class DiffLines(collections_abc.Sequence):
+    """A lazy, read-only sequence of the added / removed lines of a diff.
+
+    Rather than copying each line into its own bytes object, only the offset
+    of each line in the original diff output is stored.  Lines are sliced
+    out of the output as they are accessed.  When the lines are iterated
+    more than once they are kept after the second pass.
+    """
+    __slots__ = ('_output', '_offsets', '_iterated', '_lines')
+
+    def __init__(self, output, offsets=()):
+        self._output = output
+        self._offsets = array.array(OFFSETS_TYPECODE, offsets)
+        self._iterated = False
+        self._lines = None
+
+    def _line(self, offset):
+        end = self._output.find(b'\n', offset)
+        if end == -1:
+            end = len(self._output)
+        return self._output[offset:end]
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if self._lines is not None:
+            return self._lines[i]
+        elif isinstance(i, slice):
+            return [self._line(offset) for offset in self._offsets[i]]
+        return self._line(self._offsets[i])
+
+    def __iter__(self):
+        if self._lines is None:
+            if not self._iterated:
+                self._iterated = True
+                return (self._line(offset) for offset in self._offsets)
+            self._lines = [self._line(offset) for offset in self._offsets]
+        return iter(self._lines)
+
+    def __eq__(self, other):
+        if isinstance(other, (DiffLines, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self))
 
 
-def _to_file_diff_stat(file_diff):
-    lines = file_diff.split(b'\n')
-    diff_line_filename = lines[0].split()[-1].lstrip(b'b').lstrip(b'/')
+def _line_end(output, pos, end):
+    line_end = output.find(b'\n', pos, end)
+    return end if line_end == -1 else line_end
+
+
+def _diff_line_filename(diff_line):
+    return diff_line.split()[-1].lstrip(b'b').lstrip(b'/')
+
+
+def _to_file_diff_stat(output, start, end):
+    """Parses the `diff --git` section of `output` between start and end."""
+    pos = _line_end(output, start, end)
+    diff_line_filename = _diff_line_filename(output[start:pos])
     is_binary = False
     in_diff = False
     mode = None
@@ -60,7 +131,22 @@ def _to_file_diff_stat(file_diff):
     lines_added = []
     lines_removed = []
 
-    for line in lines[1:]:
+    pos += 1
+    while pos < end:
+        line_end = _line_end(output, pos, end)
+
+        # Once past the headers only the prefix of each line matters
+        if in_diff:
+            prefix = output[pos:pos + 1]
+            if prefix == b'+':
+                lines_added.append(pos + 1)
+            elif prefix == b'-':
+                lines_removed.append(pos + 1)
+            pos = line_end + 1
+            continue
+
+        line = output[pos:line_end]
+        pos = line_end + 1
         # Mode will be indicated somewhere between diff --git line
         # and the file added / removed lines
         # It has these forms:
@@ -95,18 +181,15 @@ def _to_file_diff_stat(file_diff):
         # --- foo/bar
         # +++ foo/bar
         # Which kind of look like diff lines but are definitely not
-        elif line.startswith(b'--- ') and not in_diff:
-            pass
-        elif line.startswith(b'+++ ') and not in_diff:
+        elif line.startswith(b'+++ '):
             in_diff = True
-        elif in_diff and line.startswith(b'+'):
-            lines_added.append(line[1:])
-        elif in_diff and line.startswith(b'-'):
-            lines_removed.append(line[1:])
 
     assert mode is not None
     assert status is not None
 
+    lines_added = DiffLines(output, lines_added)
+    lines_removed = DiffLines(output, lines_removed)
+
     # Process symlinks and submodules
     special_file = None
     if mode == SUBMODULE_MODE:
@@ -115,16 +198,16 @@ def _to_file_diff_stat(file_diff):
             added=lines_added[0].split()[-1] if lines_added else None,
             removed=lines_removed[0].split()[-1] if lines_removed else None,
         )
-        lines_added = []
-        lines_removed = []
+        lines_added = DiffLines(output)
+        lines_removed = DiffLines(output)
     elif mode == SYMLINK_MODE:
         special_file = SpecialFile(
             file_type=SpecialFileType.SYMLINK,
             added=lines_added[0] if lines_added else None,
             removed=lines_removed[0] if lines_removed else None,
         )
-        lines_added = []
-        lines_removed = []
+        lines_added = DiffLines(output)
+        lines_removed = DiffLines(output)
     elif is_binary:
         special_file = SpecialFile(
             file_type=SpecialFileType.BINARY,
@@ -144,8 +227,30 @@ def _to_file_diff_stat(file_diff):
 GIT_DIFF_RE = re.compile(b'^diff --git', flags=re.MULTILINE)
 
 
-def get_file_diff_stats_from_output(output):
+def iter_file_diff_stats_from_output(output, exclude=None):
+    """Yields a FileDiffStat for each file in the diff output.
+
+    Args:
+        output - `git diff` / `git log -p` output (bytes)
+        exclude - (optional) A compiled bytes regex, files whose path matches
+            are skipped without parsing their diff.
+    """
     assert type(output) is bytes, (type(output), output)
-    files = GIT_DIFF_RE.split(output)
-    assert not files[0].strip() or files[0].startswith(b'commit ')
-    return [_to_file_diff_stat(file_diff) for file_diff in files[1:]]
+    matches = GIT_DIFF_RE.finditer(output)
+    match = next(matches, None)
+    header = output[:match.start()] if match else output
+    assert not header.strip() or header.startswith(b'commit ')
+
+    while match:
+        start = match.start()
+        match = next(matches, None)
+        end = match.start() if match else len(output)
+        if exclude is not None:
+            diff_line = output[start:_line_end(output, start, end)]
+            if exclude.search(_diff_line_filename(diff_line)):
+                continue
+        yield _to_file_diff_stat(output, start, end)
+
+
+def get_file_diff_stats_from_output(output):
+    return list(iter_file_diff_stats_from_output(output))
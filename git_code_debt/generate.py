@@ -3,61 +3,220 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import argparse
+import array
 import collections
 import contextlib
+import functools
 import io
-import itertools
 import multiprocessing.pool
 import os.path
+import sys
+import time
 
 import six
 
 from git_code_debt import options
+from git_code_debt.database import STORAGE_FULL
+from git_code_debt.database import STORAGE_SNAPSHOT
+from git_code_debt.database import STORAGE_SPARSE
 from git_code_debt.database import WriteableDatabaseLogic
 from git_code_debt.discovery import get_metric_parsers_from_args
-from git_code_debt.file_diff_stat import get_file_diff_stats_from_output
+from git_code_debt.file_diff_stat import iter_file_diff_stats_from_output
+from git_code_debt.generate_config import DEFAULT_SNAPSHOT_INTERVAL
 from git_code_debt.generate_config import GenerateOptions
+from git_code_debt.metrics.base import get_line_counter_metrics
+from git_code_debt.metrics.base import is_line_counter
 from git_code_debt.repo_parser import RepoParser
 from git_code_debt.util import yaml
+from git_code_debt.util.pipeline import ordered_imap
+from git_code_debt.util.time import period_start
+from git_code_debt.util.time import ROLLUP_PERIODS
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHECKPOINT_SECONDS = 60
+# Commits queued to or waiting to be collected from each worker process
+PENDING_PER_JOB = 4
+# Python 2 has no 'q' (long long), 'l' is 64 bit on most python 2 platforms
+METRICS_TYPECODE = str('q') if six.PY3 else str('l')
+
+# The arguments shared by every commit, set once in each worker process
+_worker_context = {}
 
 
 def get_metrics(commit, diff, metric_parsers, exclude):
     def get_all_metrics(file_diff_stats):
+        # Simple line counters are evaluated together in a single pass
+        line_counters = []
         for metric_parser_cls in metric_parsers:
             metric_parser = metric_parser_cls()
+            if is_line_counter(metric_parser):
+                line_counters.append(metric_parser)
+                continue
             for metric in metric_parser.get_metrics_from_stat(
                 commit, file_diff_stats,
             ):
                 yield metric
 
-    file_diff_stats = get_file_diff_stats_from_output(diff)
-    file_diff_stats = tuple(
-        x for x in file_diff_stats
-        if not exclude.search(x.path)
-    )
+        for metric in get_line_counter_metrics(line_counters, file_diff_stats):
+            yield metric
+
+    file_diff_stats = tuple(iter_file_diff_stats_from_output(diff, exclude))
     return tuple(get_all_metrics(file_diff_stats))
 
 
-def increment_metrics(metric_values, metric_mapping, metrics):
-    metric_values.update({metric_mapping[m.name]: m.value for m in metrics})
+def pack_metrics(metrics, metric_mapping):
+    """Packs the metrics which changed into an array of alternating
+    metric_id / value.  This is much cheaper to send between processes than
+    `Metric`s with their names.
+    """
+    ret = array.array(METRICS_TYPECODE)
+    for metric in metrics:
+        if metric.value:
+            ret.extend((metric_mapping[metric.name], metric.value))
+    return ret
+
+
+def unpack_metrics(packed):
+    """Gets (metric_id, value) for each metric packed by `pack_metrics`."""
+    return list(zip(packed[::2], packed[1::2]))
+
+
+def increment_metrics(metric_values, metrics):
+    metric_values.update(dict(metrics))
+
+
+def changed_metric_values(metric_values, metrics):
+    return {
+        metric_id: metric_values[metric_id]
+        for metric_id, value in metrics if value
+    }
+
+
+def get_rollups(commit, previous_date, metric_values, metrics):
+    """Gets (period, bucket, metric_id, min, max, value) for the metrics which
+    changed in the commit.  When the bucket already has commits, the value
+    before the change is part of the bucket's minimum / maximum.
+
+    Args:
+       commit - The Commit
+       previous_date - Timestamp of the previous commit (None if there is none)
+       metric_values - Maps metric_id to the running value after the commit
+       metrics - (metric_id, value) of the metrics changed by the commit
+    """
+    rollups = []
+    for period, _ in ROLLUP_PERIODS:
+        bucket = period_start(period, commit.date)
+        continued = (
+            previous_date is not None and
+            period_start(period, previous_date) == bucket
+        )
+        for metric_id, change in metrics:
+            if not change:
+                continue
+            value = metric_values[metric_id]
+            if continued:
+                values = (value, value - change)
+            else:
+                values = (value,)
+            rollups.append(
+                (period, bucket, metric_id, min(values), max(values), value),
+            )
+    return rollups
+
+
+def get_rewind_point(stored_commits, first_parent_shas):
+    """Finds where to resume generating from after the history has been
+    rewritten.  This is the newest stored commit still in the history which
+    is older than every rollup bucket of the commits after it, so those
+    buckets are generated again in full.
+
+    Args:
+       stored_commits - (sha, timestamp) of the stored commits, newest first
+       first_parent_shas - The shas of the current first-parent history
+    Returns (sha, rollup_buckets) - the sha to keep (None to generate every
+    commit again) and the first bucket to delete for each period
+    """
+    in_history = False
+    rollup_buckets = {}
+    for sha, timestamp in stored_commits:
+        in_history = in_history or sha in first_parent_shas
+        if in_history and (
+                not rollup_buckets or
+                timestamp < min(rollup_buckets.values())
+        ):
+            return sha, rollup_buckets
+        for period, _ in ROLLUP_PERIODS:
+            bucket = period_start(period, timestamp)
+            rollup_buckets[period] = min(
+                rollup_buckets.get(period, bucket), bucket,
+            )
+    return None, rollup_buckets
+
+
+def rewind_rewritten_history(db_logic, repo_parser):
+    """Deletes the commits which are no longer in the (first-parent) history,
+    for example after a force push, so generate continues from where the
+    histories diverged instead of starting again.
+    """
+    previous_sha = db_logic.get_previous_sha()
+    if previous_sha is None:
+        return
+    first_parent_shas = repo_parser.get_first_parent_shas()
+    if previous_sha in first_parent_shas:
+        return
+
+    stored_commits = db_logic.iter_commits_newest_first()
+    with contextlib.closing(stored_commits):
+        sha, rollup_buckets = get_rewind_point(stored_commits, first_parent_shas)
+    print(
+        '{} is no longer in the history, generating again after {}'.format(
+            previous_sha, sha or 'the first commit',
+        ),
+        file=sys.stderr,
+    )
+    db_logic.delete_commits_after(sha, rollup_buckets)
+    db_logic.commit()
+
+
+def _init_worker(metric_parsers, exclude, metric_mapping):
+    _worker_context.update(
+        metric_parsers=metric_parsers,
+        exclude=exclude,
+        metric_mapping=metric_mapping,
+    )
 
 
 def _get_metrics_inner(mp_args):
-    compare_commit, commit, repo_parser, metric_parsers, exclude = mp_args
-    if compare_commit is None:
-        diff = repo_parser.get_original_commit(commit.sha)
-    else:
-        diff = repo_parser.get_commit_diff(compare_commit.sha, commit.sha)
-    return get_metrics(commit, diff, metric_parsers, exclude)
+    commit, diff = mp_args
+    metrics = get_metrics(
+        commit,
+        diff,
+        _worker_context['metric_parsers'],
+        _worker_context['exclude'],
+    )
+    return commit, pack_metrics(metrics, _worker_context['metric_mapping'])
 
 
 @contextlib.contextmanager
-def mapper(jobs):
+def mapper(jobs, initializer=None, initargs=()):
     if jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
         yield map
     else:
-        with contextlib.closing(multiprocessing.Pool(jobs)) as pool:
-            yield pool.imap
+        pool = multiprocessing.Pool(
+            jobs, initializer=initializer, initargs=initargs,
+        )
+        with contextlib.closing(pool):
+            # Reading the diffs from git, computing the metrics (in the pool)
+            # and writing them (in this process) happen concurrently.  The
+            # number of commits in progress is bounded so a slow stage does
+            # not leave the others buffering every commit in memory.
+            yield functools.partial(
+                ordered_imap,
+                pool.apply_async,
+                max_pending=jobs * PENDING_PER_JOB,
+            )
 
 
 def load_data(
@@ -67,47 +226,86 @@ def load_data(
         skip_defaults,
         exclude,
         jobs,
+        batch_size=DEFAULT_BATCH_SIZE,
+        pragmas=(),
+        snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL,
+        checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS,
 ):
     metric_parsers = get_metric_parsers_from_args(package_names, skip_defaults)
 
     with WriteableDatabaseLogic.for_sqlite(database_file) as db_logic:
+        for name, value in pragmas:
+            db_logic.set_pragma(name, value)
+        db_logic.migrate()
+
         metric_mapping = db_logic.get_metric_mapping()
-        has_data = db_logic.get_metric_has_data()
+        storage_mode = db_logic.storage_mode
 
         repo_parser = RepoParser(repo)
 
         with repo_parser.repo_checked_out():
-            previous_sha = db_logic.get_previous_sha()
-            commits = repo_parser.get_commits(since_sha=previous_sha)
+            rewind_rewritten_history(db_logic, repo_parser)
 
-            # If there is nothing to check gtfo
-            if len(commits) == 1 and previous_sha is not None:
-                return
+            has_data = db_logic.get_metric_has_data()
+            if storage_mode == STORAGE_SNAPSHOT:
+                commit_count = db_logic.get_commit_count()
+            previous_sha = db_logic.get_previous_sha()
 
             # Maps metric_id to a running value
             metric_values = collections.Counter()
 
             # Grab the state of our metrics at the last place
-            compare_commit = None
             if previous_sha is not None:
-                compare_commit = commits.pop(0)
-                metric_values.update(db_logic.get_metric_values(compare_commit.sha))
-
-            mp_args = six.moves.zip(
-                [compare_commit] + commits,
-                commits,
-                itertools.repeat(repo_parser),
-                itertools.repeat(metric_parsers),
-                itertools.repeat(exclude),
-            )
-            with mapper(jobs) as do_map:
-                for commit, metrics in six.moves.zip(
-                        commits, do_map(_get_metrics_inner, mp_args),
-                ):
-                    db_logic.update_has_data(metrics, metric_mapping, has_data)
-                    increment_metrics(metric_values, metric_mapping, metrics)
-                    db_logic.insert_metric_values(metric_values, has_data, commit)
-                    db_logic.insert_metric_changes(metrics, metric_mapping, commit)
+                metric_values.update(db_logic.get_metric_values(previous_sha))
+                previous_date = repo_parser.get_commit(previous_sha).date
+            else:
+                previous_date = None
+
+            checkpoint_time = time.time()
+            commit = None
+            with mapper(
+                    jobs,
+                    initializer=_init_worker,
+                    initargs=(metric_parsers, exclude, metric_mapping),
+            ) as do_map:
+                results = do_map(
+                    _get_metrics_inner,
+                    repo_parser.get_commit_diffs(previous_sha),
+                )
+                for i, (commit, packed) in enumerate(results, 1):
+                    metrics = unpack_metrics(packed)
+                    db_logic.update_has_data(metrics, has_data)
+                    increment_metrics(metric_values, metrics)
+                    if storage_mode == STORAGE_FULL:
+                        db_logic.insert_metric_values(
+                            metric_values, has_data, commit,
+                        )
+                    elif storage_mode == STORAGE_SPARSE:
+                        db_logic.insert_commit(commit)
+                        values = changed_metric_values(metric_values, metrics)
+                        db_logic.insert_metric_values(values, has_data, commit)
+                    else:
+                        db_logic.insert_commit(commit)
+                        commit_count += 1
+                        if commit_count % snapshot_interval == 0:
+                            db_logic.insert_metric_snapshot(
+                                metric_values, has_data, commit,
+                            )
+                    db_logic.insert_metric_changes(metrics, commit)
+                    db_logic.insert_rollups(
+                        get_rollups(commit, previous_date, metric_values, metrics),
+                    )
+                    previous_date = commit.date
+                    # One transaction per batch of commits (or period of
+                    # time), an interrupted run continues from the last one
+                    if (
+                            i % batch_size == 0 or
+                            time.time() - checkpoint_time >= checkpoint_seconds
+                    ):
+                        db_logic.checkpoint(commit.sha)
+                        checkpoint_time = time.time()
+            if commit is not None:
+                db_logic.checkpoint(commit.sha)
 
 
 def get_metrics_info(metric_parsers):
@@ -126,6 +324,7 @@ def populate_metric_ids(db_logic, package_names, skip_defaults):
 def create_database(args):
     with WriteableDatabaseLogic.for_sqlite(args.database) as db_logic:
         db_logic.create_schema()
+        db_logic.set_storage_mode(args.storage_mode)
         populate_metric_ids(
             db_logic,
             args.metric_package_names,
@@ -148,6 +347,30 @@ def main(argv=None):
     parser.add_argument(
         '-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
     )
+    parser.add_argument(
+        '--batch-size', type=options.positive_int, default=DEFAULT_BATCH_SIZE,
+        help=(
+            'Number of commits written (with `executemany`) per transaction.  '
+            'An interrupted run continues from the last transaction.  '
+            'Default %(default)s.'
+        ),
+    )
+    parser.add_argument(
+        '--checkpoint-seconds', type=int, default=DEFAULT_CHECKPOINT_SECONDS,
+        help=(
+            'Also commit the transaction when it has been open this many '
+            'seconds.  Default %(default)s.'
+        ),
+    )
+    parser.add_argument(
+        '--journal-mode',
+        choices=('delete', 'truncate', 'persist', 'memory', 'wal', 'off'),
+        help='sqlite `journal_mode` pragma, such as `wal`.',
+    )
+    parser.add_argument(
+        '--synchronous', choices=('off', 'normal', 'full', 'extra'),
+        help='sqlite `synchronous` pragma, such as `normal`.',
+    )
     parsed_args = parser.parse_args(argv)
     args = get_options_from_config(parsed_args.config_filename)
 
@@ -161,6 +384,16 @@ def main(argv=None):
         args.skip_default_metrics,
         args.exclude,
         parsed_args.jobs,
+        batch_size=parsed_args.batch_size,
+        snapshot_interval=args.snapshot_interval,
+        checkpoint_seconds=parsed_args.checkpoint_seconds,
+        pragmas=tuple(
+            (name, value) for name, value in (
+                ('journal_mode', parsed_args.journal_mode),
+                ('synchronous', parsed_args.synchronous),
+            )
+            if value is not None
+        ),
     )
 
 
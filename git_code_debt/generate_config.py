@@ -6,8 +6,22 @@ import re
 
 import cfgv
 
+from git_code_debt.database import STORAGE_FULL
+from git_code_debt.database import STORAGE_MODES
 
 DEFAULT_GENERATE_CONFIG_FILENAME = 'generate_config.yaml'
+DEFAULT_SNAPSHOT_INTERVAL = 100
+
+
+def _check_positive(v):
+    if v < 1:
+        raise cfgv.ValidationError(
+            'Expected a positive integer got {!r}'.format(v),
+        )
+
+
+check_positive_int = cfgv.check_and(cfgv.check_int, _check_positive)
+
 SCHEMA = cfgv.Map(
     'Config', 'repo',
 
@@ -18,6 +32,12 @@ SCHEMA = cfgv.Map(
         'metric_package_names', cfgv.check_array(cfgv.check_string), [],
     ),
     cfgv.Optional('exclude', cfgv.check_regex, '^$'),
+    cfgv.Optional(
+        'storage_mode', cfgv.check_one_of(STORAGE_MODES), STORAGE_FULL,
+    ),
+    cfgv.Optional(
+        'snapshot_interval', check_positive_int, DEFAULT_SNAPSHOT_INTERVAL,
+    ),
 )
 
 
@@ -30,6 +50,8 @@ class GenerateOptions(
                 'repo',
                 'database',
                 'exclude',
+                'storage_mode',
+                'snapshot_interval',
             ),
         ),
 ):
@@ -42,4 +64,6 @@ class GenerateOptions(
             repo=dct['repo'],
             database=dct['database'],
             exclude=re.compile(dct['exclude'].encode()),
+            storage_mode=dct['storage_mode'],
+            snapshot_interval=dct['snapshot_interval'],
         )
@@ -3,6 +3,9 @@ from __future__ import unicode_literals
 
 import collections
 import inspect
+import re
+
+import six
 
 from git_code_debt.metric import Metric
 
@@ -45,19 +48,7 @@ class SimpleLineCounterBase(DiffParserBase):
     __metric__ = False
 
     def get_metrics_from_stat(self, _, file_diff_stats):
-        metric_value = 0
-
-        for file_diff_stat in file_diff_stats:
-            if self.should_include_file(file_diff_stat):
-                for line in file_diff_stat.lines_added:
-                    if self.line_matches_metric(line, file_diff_stat):
-                        metric_value += 1
-                for line in file_diff_stat.lines_removed:
-                    if self.line_matches_metric(line, file_diff_stat):
-                        metric_value -= 1
-
-        if metric_value:
-            yield Metric(self.metric_name, metric_value)
+        return get_line_counter_metrics((self,), file_diff_stats)
 
     def get_metrics_info(self):
         return [MetricInfo(self.metric_name, self.metric_description)]
@@ -91,3 +82,169 @@ class SimpleLineCounterBase(DiffParserBase):
         :param FileDiffStat file_diff_stat:
         """
         raise NotImplementedError
+
+
+# (class, attribute name) -> compiled pattern of LinePatternCounterBase classes
+_compiled_patterns = {}
+
+
+class LinePatternCounterBase(SimpleLineCounterBase):
+    """A line counter declared entirely by patterns on the class:
+
+        pattern - bytes regex, a line matches the metric if it is found
+            anywhere in the line.
+        file_pattern - (optional) bytes regex, only files whose path it is
+            found in are included.  By default all files are included.
+
+    The patterns of all pattern counters are combined so most lines are
+    rejected by a single regex search.
+    """
+    __metric__ = False
+
+    pattern = None
+    file_pattern = None
+
+    @classmethod
+    def _compile(cls, name):
+        """Compiles a pattern attribute once per class."""
+        key = (cls, name)
+        if key not in _compiled_patterns:
+            pattern = getattr(cls, name)
+            _compiled_patterns[key] = (
+                None if pattern is None else re.compile(pattern)
+            )
+        return _compiled_patterns[key]
+
+    @property
+    def compiled_pattern(self):
+        return self._compile('pattern')
+
+    @property
+    def compiled_file_pattern(self):
+        return self._compile('file_pattern')
+
+    def should_include_file(self, file_diff_stat):
+        file_pattern = self.compiled_file_pattern
+        return (
+            file_pattern is None or
+            file_pattern.search(file_diff_stat.path) is not None
+        )
+
+    def line_matches_metric(self, line, file_diff_stat):
+        return self.compiled_pattern.search(line) is not None
+
+
+def _is_overridden(obj, base, name):
+    return (
+        six.get_unbound_function(getattr(type(obj), name)) is not
+        six.get_unbound_function(getattr(base, name))
+    )
+
+
+def is_line_counter(metric_parser):
+    """Whether the metric parser only counts lines and can therefore be
+    evaluated with `get_line_counter_metrics`.
+    """
+    return (
+        isinstance(metric_parser, SimpleLineCounterBase) and
+        not _is_overridden(
+            metric_parser, SimpleLineCounterBase, 'get_metrics_from_stat',
+        )
+    )
+
+
+def _is_line_pattern_counter(line_counter):
+    return (
+        isinstance(line_counter, LinePatternCounterBase) and
+        not _is_overridden(
+            line_counter, LinePatternCounterBase, 'line_matches_metric',
+        )
+    )
+
+
+# Numbered groups are renumbered when patterns are combined
+BACKREFERENCE_RE = re.compile(br'\\[1-9]|\(\?P=')
+
+
+def _combine_patterns(patterns):
+    """Returns a regex which matches a line if any of the patterns do (or
+    None if the patterns cannot be combined).
+    """
+    flags = {pattern.flags for pattern in patterns}
+    if (
+            len(patterns) < 2 or
+            len(flags) != 1 or
+            any(BACKREFERENCE_RE.search(p.pattern) for p in patterns)
+    ):
+        return None
+    try:
+        return re.compile(
+            b'|'.join(b'(?:' + p.pattern + b')' for p in patterns),
+            flags.pop(),
+        )
+    except re.error:
+        return None
+
+
+def get_line_counter_metrics(line_counters, file_diff_stats):
+    """Yields the metrics of many SimpleLineCounterBase objects at once.
+
+    Each file's lines are walked a single time and handed to every counter
+    which includes that file (rather than once per counter).  The patterns of
+    LinePatternCounterBase counters are combined into one regex so a line
+    matching none of them costs a single search.
+
+    Args:
+        line_counters - sequence of SimpleLineCounterBase objects
+        file_diff_stats - iterable of FileDiffStat objects
+    """
+    metric_values = [0] * len(line_counters)
+    patterns = [
+        line_counter.compiled_pattern
+        if _is_line_pattern_counter(line_counter) else None
+        for line_counter in line_counters
+    ]
+    combined_patterns = {}
+
+    for file_diff_stat in file_diff_stats:
+        included = [
+            i for i, line_counter in enumerate(line_counters)
+            if line_counter.should_include_file(file_diff_stat)
+        ]
+        if not included:
+            continue
+
+        matchers = [
+            (i, line_counters[i].line_matches_metric)
+            for i in included if patterns[i] is None
+        ]
+        searchers = [
+            (i, patterns[i].search) for i in included if patterns[i]
+        ]
+        key = tuple(i for i, _ in searchers)
+        if key not in combined_patterns:
+            combined_patterns[key] = _combine_patterns([
+                patterns[i] for i in key
+            ])
+        combined_pattern = combined_patterns[key]
+
+        for lines, delta in (
+                (file_diff_stat.lines_added, 1),
+                (file_diff_stat.lines_removed, -1),
+        ):
+            for line in lines:
+                for i, line_matches_metric in matchers:
+                    if line_matches_metric(line, file_diff_stat):
+                        metric_values[i] += delta
+                if not searchers or (
+                        combined_pattern is not None and
+                        combined_pattern.search(line) is None
+                ):
+                    continue
+                for i, search in searchers:
+                    if search(line) is not None:
+                        metric_values[i] += delta
+
+    for line_counter, metric_value in zip(line_counters, metric_values):
+        if metric_value:
+            yield Metric(line_counter.metric_name, metric_value)
@@ -3,6 +3,8 @@ from __future__ import unicode_literals
 
 from identify import identify
 
+from git_code_debt.util.lru import LRUCache
+
 UNKNOWN = 'unknown'
 IGNORED_TAGS = frozenset((
     identify.DIRECTORY, identify.SYMLINK, identify.FILE,
@@ -10,3 +12,18 @@ IGNORED_TAGS = frozenset((
     identify.TEXT, identify.BINARY,
 ))
 ALL_TAGS = frozenset((identify.ALL_TAGS - IGNORED_TAGS) | {UNKNOWN})
+
+# Shared by all metric parsers (and commits) in a process
+TAGS_CACHE = LRUCache(maxsize=2 ** 16)
+
+
+def tags_from_filename(filename):
+    """Returns the `identify` tags for a filename (bytes) or {UNKNOWN}.
+
+    Tags only depend on the name, so results are cached by filename.
+    """
+    tags = TAGS_CACHE.get(filename)
+    if tags is None:
+        tags = identify.tags_from_filename(filename.decode('UTF-8'))
+        tags = TAGS_CACHE[filename] = frozenset(tags or {UNKNOWN})
+    return tags
@@ -3,13 +3,11 @@ from __future__ import unicode_literals
 
 import collections
 
-from identify import identify
-
 from git_code_debt.metric import Metric
 from git_code_debt.metrics.base import DiffParserBase
 from git_code_debt.metrics.base import MetricInfo
 from git_code_debt.metrics.common import ALL_TAGS
-from git_code_debt.metrics.common import UNKNOWN
+from git_code_debt.metrics.common import tags_from_filename
 
 
 class LinesOfCodeParser(DiffParserBase):
@@ -28,8 +26,7 @@ class LinesOfCodeParser(DiffParserBase):
             # Track total overall
             total_lines += lines_changed
 
-            filename = file_diff_stat.filename.decode('UTF-8')
-            tags = identify.tags_from_filename(filename) or {UNKNOWN}
+            tags = tags_from_filename(file_diff_stat.filename)
 
             for tag in tags:
                 lines_by_file_type[tag] += lines_changed
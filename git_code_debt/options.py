@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import argparse
+
 from git_code_debt.generate_config import DEFAULT_GENERATE_CONFIG_FILENAME
 
 
@@ -19,3 +21,13 @@ def add_generate_config_filename(argparser):
         '-C', '--config-filename', default=DEFAULT_GENERATE_CONFIG_FILENAME,
         help='Path to generate config.',
     )
+
+
+def positive_int(s):
+    """An argparse `type` for integers greater than 0."""
+    value = int(s)
+    if value < 1:
+        raise argparse.ArgumentTypeError(
+            'expected a positive integer: {}'.format(s),
+        )
+    return value
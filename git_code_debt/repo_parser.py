@@ -3,18 +3,35 @@ from __future__ import unicode_literals
 
 import collections
 import contextlib
+import re
 import shutil
 import subprocess
 import tempfile
 
 from git_code_debt.util.iter import chunk_iter
+from git_code_debt.util.subprocess import BatchProcess
+from git_code_debt.util.subprocess import CalledProcessError
 from git_code_debt.util.subprocess import cmd_output
+from git_code_debt.util.subprocess import cmd_output_lines
 
 
 Commit = collections.namedtuple('Commit', ('sha', 'date'))
 Commit.blank = Commit('0' * 40, 0)
 
 COMMIT_FORMAT = '--format=%H%n%ct'
+# Each commit in the `git log -p` stream starts with a `commit ` line, this
+# keeps the output parseable by `get_file_diff_stats_from_output`
+LOG_FORMAT = '--format=commit %H%n%ct'
+
+CAT_FILE_CMD = ('git', 'cat-file', '--batch')
+DIFF_TREE_CMD = (
+    'git', 'diff-tree', '--stdin', '--always', '-p', '-r', '--root',
+    '--no-renames',
+)
+# `git diff-tree --stdin` echoes lines which are not object names, this marks
+# the end of each response.  Diff content lines are always prefixed.
+DIFF_TREE_END = b'--git-code-debt-end--\n'
+FULL_SHA_RE = re.compile('^(?:[0-9a-f]{40}|[0-9a-f]{64})$')
 
 
 class RepoParser(object):
@@ -22,6 +39,8 @@ class RepoParser(object):
     def __init__(self, git_repo):
         self.git_repo = git_repo
         self.tempdir = None
+        # Long-lived git processes, keyed by command
+        self._batch_processes = {}
 
     @contextlib.contextmanager
     def repo_checked_out(self):
@@ -35,16 +54,62 @@ class RepoParser(object):
             ))
             yield
         finally:
+            for batch_process in self._batch_processes.values():
+                batch_process.close()
+            self._batch_processes.clear()
             shutil.rmtree(self.tempdir)
             self.tempdir = None
 
-    def get_commit(self, sha):
-        output = cmd_output(
-            'git', 'show', COMMIT_FORMAT, sha, cwd=self.tempdir,
-        )
-        sha, date = output.splitlines()[:2]
+    def _batch_process(self, cmd):
+        batch_process = self._batch_processes.get(cmd)
+        if batch_process is None or not batch_process.alive:
+            batch_process = BatchProcess(*cmd, cwd=self.tempdir)
+            self._batch_processes[cmd] = batch_process
+        return batch_process
+
+    def _cat_file(self, name):
+        batch_process = self._batch_process(CAT_FILE_CMD)
+        batch_process.write(name.encode('UTF-8') + b'\n')
+        line = batch_process.readline()
+        header = line.split()
+        if len(header) != 3:
+            raise CalledProcessError(
+                '{}: {}'.format(name, line.decode('UTF-8').strip()),
+            )
+        sha, _, size = header
+        # The contents are followed by a newline
+        contents = batch_process.read(int(size) + 1)[:-1]
+        return sha.decode('UTF-8'), contents
+
+    def _resolve_commit(self, rev):
+        """Gets the full sha of a revision such as `HEAD^` or a short sha."""
+        if FULL_SHA_RE.match(rev):
+            return rev
+        sha, _ = self._cat_file('{}^{{commit}}'.format(rev))
+        return sha
+
+    def _diff_tree(self, *revs):
+        # `diff-tree --stdin` only understands full object names
+        shas = [self._resolve_commit(rev) for rev in revs]
+        batch_process = self._batch_process(DIFF_TREE_CMD)
+        batch_process.write(' '.join(shas).encode('UTF-8') + b'\n')
+        batch_process.write(DIFF_TREE_END)
+        # Each response starts with the commit being diffed (`--always`)
+        batch_process.readline()
+        lines = []
+        line = batch_process.readline()
+        while line != DIFF_TREE_END:
+            lines.append(line)
+            line = batch_process.readline()
+        return b''.join(lines)
 
-        return Commit(sha, int(date))
+    def get_commit(self, sha):
+        sha, contents = self._cat_file('{}^{{commit}}'.format(sha))
+        for line in contents.splitlines():
+            if line.startswith(b'committer '):
+                date = line.split()[-2]
+                return Commit(sha, int(date))
+        raise AssertionError('No committer: {!r}'.format(contents))
 
     def get_commits(self, since_sha=None):
         """Returns a list of Commit objects.
@@ -69,17 +134,56 @@ class RepoParser(object):
 
         return commits
 
-    def get_original_commit(self, sha):
+    def get_first_parent_shas(self):
+        """Returns the shas of the first-parent history of HEAD."""
         assert self.tempdir
         output = cmd_output(
-            'git', 'show', sha, cwd=self.tempdir, encoding=None,
+            'git', 'rev-list', '--first-parent', 'HEAD', cwd=self.tempdir,
         )
-        return output
+        return frozenset(output.split())
+
+    def get_original_commit(self, sha):
+        assert self.tempdir
+        return self._diff_tree(sha)
 
     def get_commit_diff(self, previous_sha, sha):
         assert self.tempdir
-        output = cmd_output(
-            'git', 'diff', previous_sha, sha, '--no-renames',
-            cwd=self.tempdir, encoding=None,
-        )
-        return output
+        # `diff-tree` treats additional commits on the line as the parents
+        return self._diff_tree(sha, previous_sha)
+
+    def get_commit_diffs(self, since_sha=None):
+        """Yields (Commit, diff) for each commit on the first-parent history.
+
+        Rather than invoking `git diff` for each commit, this streams a single
+        `git log -p` and splits it as it is read.  Each diff is relative to the
+        commit's first parent (the root commit is diffed against nothing).
+
+        Args:
+           since_sha - (optional) Only yield commits after this sha
+        """
+        assert self.tempdir
+
+        cmd = [
+            'git', 'log', '--first-parent', '--reverse', '-m', '-p', '--root',
+            '--no-renames', '--no-color', '--no-ext-diff', LOG_FORMAT,
+        ]
+        if since_sha:
+            cmd.append('{}..HEAD'.format(since_sha))
+        else:
+            cmd.append('HEAD')
+
+        lines = []
+        for line in cmd_output_lines(*cmd, cwd=self.tempdir):
+            # Diff content lines are always prefixed so this is unambiguous
+            if line.startswith(b'commit ') and lines:
+                yield _to_commit_diff(lines)
+                lines = []
+            lines.append(line)
+        if lines:
+            yield _to_commit_diff(lines)
+
+
+def _to_commit_diff(lines):
+    sha = lines[0].split()[1].decode('UTF-8')
+    date = int(lines[1])
+    return Commit(sha, date), b''.join(lines)
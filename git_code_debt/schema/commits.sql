@@ -0,0 +1,7 @@
+CREATE TABLE commits (
+    id INTEGER PRIMARY KEY ASC,
+    sha CHAR(40) NOT NULL UNIQUE,
+    timestamp INTEGER NOT NULL
+);
+
+CREATE INDEX commits__timestamp_idx ON commits (timestamp);
@@ -0,0 +1,6 @@
+CREATE TABLE metric_snapshots (
+    commit_id INTEGER NOT NULL,
+    metric_id INTEGER NOT NULL,
+    running_value INTEGER NOT NULL,
+    PRIMARY KEY (commit_id, metric_id)
+);
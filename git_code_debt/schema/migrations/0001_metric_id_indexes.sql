@@ -0,0 +1,8 @@
+-- Lookups of a metric's values in a time range, covering running_value
+CREATE INDEX IF NOT EXISTS metric_data__metric_id_timestamp_value_idx
+ON metric_data (metric_id, timestamp, running_value);
+-- Lookups of a metric's rows in insertion (commit) order (sparse storage)
+CREATE INDEX IF NOT EXISTS metric_data__metric_id_idx ON metric_data (metric_id);
+
+CREATE INDEX IF NOT EXISTS metric_changes__metric_id_idx
+ON metric_changes (metric_id);
@@ -0,0 +1,69 @@
+-- Per-metric values at day / week / month granularity, a row is only written
+-- for the buckets where the metric's value changes
+CREATE TABLE IF NOT EXISTS metric_rollups (
+    period CHAR(8) NOT NULL,
+    bucket INTEGER NOT NULL,
+    metric_id INTEGER NOT NULL,
+    min_value INTEGER NOT NULL,
+    max_value INTEGER NOT NULL,
+    running_value INTEGER NOT NULL,
+    PRIMARY KEY (period, metric_id, bucket)
+);
+
+-- Backfill from existing data, the running_value is from the last row
+INSERT OR IGNORE INTO metric_rollups (
+    period, bucket, metric_id, min_value, max_value, running_value
+)
+SELECT
+    'day', grouped.bucket, grouped.metric_id,
+    grouped.min_value, grouped.max_value, metric_data.running_value
+FROM (
+    SELECT
+        timestamp - timestamp % 86400 AS bucket,
+        metric_id,
+        MIN(running_value) AS min_value,
+        MAX(running_value) AS max_value,
+        MAX(ROWID) AS last_rowid
+    FROM metric_data
+    GROUP BY bucket, metric_id
+) AS grouped
+INNER JOIN metric_data ON metric_data.ROWID = grouped.last_rowid;
+
+-- Weeks start on Monday, 1970-01-05 (345600) is the first after the epoch
+INSERT OR IGNORE INTO metric_rollups (
+    period, bucket, metric_id, min_value, max_value, running_value
+)
+SELECT
+    'week', grouped.bucket, grouped.metric_id,
+    grouped.min_value, grouped.max_value, metric_data.running_value
+FROM (
+    SELECT
+        timestamp - (timestamp - 345600) % 604800 AS bucket,
+        metric_id,
+        MIN(running_value) AS min_value,
+        MAX(running_value) AS max_value,
+        MAX(ROWID) AS last_rowid
+    FROM metric_data
+    GROUP BY bucket, metric_id
+) AS grouped
+INNER JOIN metric_data ON metric_data.ROWID = grouped.last_rowid;
+
+INSERT OR IGNORE INTO metric_rollups (
+    period, bucket, metric_id, min_value, max_value, running_value
+)
+SELECT
+    'month', grouped.bucket, grouped.metric_id,
+    grouped.min_value, grouped.max_value, metric_data.running_value
+FROM (
+    SELECT
+        CAST(
+            strftime('%s', timestamp, 'unixepoch', 'start of month') AS INTEGER
+        ) AS bucket,
+        metric_id,
+        MIN(running_value) AS min_value,
+        MAX(running_value) AS max_value,
+        MAX(ROWID) AS last_rowid
+    FROM metric_data
+    GROUP BY bucket, metric_id
+) AS grouped
+INNER JOIN metric_data ON metric_data.ROWID = grouped.last_rowid;
@@ -0,0 +1,6 @@
+-- Database settings (the storage mode) and generate's resume marker, also
+-- added to databases from before storage modes
+CREATE TABLE IF NOT EXISTS metadata (
+    key CHAR(255) PRIMARY KEY,
+    value BLOB
+);
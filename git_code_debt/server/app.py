@@ -3,21 +3,33 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import argparse
+import datetime
+import hashlib
 import os.path
 import shutil
 
 import flask
 import pkg_resources
+import six
 
 from git_code_debt.database import DatabaseLogic
+from git_code_debt.server.connection_pool import connect_readonly
+from git_code_debt.server.connection_pool import ConnectionPool
+from git_code_debt.server.connection_pool import DEFAULT_MAX_IDLE
 from git_code_debt.server.metric_config import Config
+from git_code_debt.server.render_mako import preload_templates
+from git_code_debt.server.serving import serve
+from git_code_debt.server.serving import ThreadPoolWSGIServer
 from git_code_debt.server.servlets.changes import changes
 from git_code_debt.server.servlets.commit import commit
 from git_code_debt.server.servlets.graph import graph
 from git_code_debt.server.servlets.index import index
 from git_code_debt.server.servlets.status import status
+from git_code_debt.server.servlets.widget import GENERATE_CONFIG
 from git_code_debt.server.servlets.widget import widget
+from git_code_debt.server.servlets.widget import widget_config
 from git_code_debt.util import yaml
+from git_code_debt.util.lru import LRUCache
 
 
 app = flask.Flask(__name__)
@@ -29,21 +41,83 @@ app.register_blueprint(status)
 app.register_blueprint(widget)
 
 
+# Pages which only change when new data is generated
+CACHED_ENDPOINTS = frozenset((
+    'changes.show', 'commit.show', 'graph.show', 'index.show',
+))
+DEFAULT_CACHE_SIZE = 256
+
+
 class AppContext(object):
     database_path = 'database.db'
+    connection_pool = ConnectionPool(database_path)
     config = None
+    # Changes the cache key (and ETag) of pages when the config changes
+    config_version = ''
+    # Maps (path, database_path, previous sha, date, config_version) to a
+    # rendered response
+    response_cache = LRUCache(maxsize=DEFAULT_CACHE_SIZE)
+
+
+def get_etag(cache_key):
+    return hashlib.sha256(
+        '\0'.join(six.text_type(part) for part in cache_key).encode('UTF-8'),
+    ).hexdigest()
 
 
 @app.before_request
 def before_request():
     flask.g.config = AppContext.config
-    flask.g.db_logic = DatabaseLogic.for_sqlite(AppContext.database_path)
+    flask.g.db = AppContext.connection_pool.acquire()
+    flask.g.db_logic = DatabaseLogic(flask.g.db)
+    flask.g.cache_key = None
+
+    if (
+            flask.request.method == 'GET' and
+            flask.request.endpoint in CACHED_ENDPOINTS
+    ):
+        # The key changes when generate adds data (or the day changes, pages
+        # show times relative to today) so stale responses are never used
+        cache_key = (
+            flask.request.full_path,
+            AppContext.database_path,
+            flask.g.db_logic.get_previous_sha(),
+            datetime.date.today(),
+            AppContext.config_version,
+        )
+        # Clients with the current page only need to be told it is unchanged
+        etag = get_etag(cache_key)
+        if etag in flask.request.if_none_match:
+            response = flask.Response(status=304)
+            response.set_etag(etag)
+            return response
+        cached = AppContext.response_cache.get(cache_key)
+        if cached is not None:
+            data, status_code, headers = cached
+            return flask.Response(data, status=status_code, headers=headers)
+        flask.g.cache_key = cache_key
+
+
+@app.after_request
+def after_request(response):
+    if flask.g.cache_key is not None and response.status_code == 200:
+        # Browsers revalidate (with If-None-Match) before reusing the page
+        response.set_etag(get_etag(flask.g.cache_key))
+        response.cache_control.no_cache = True
+        AppContext.response_cache[flask.g.cache_key] = (
+            response.get_data(),
+            response.status_code,
+            list(response.headers.items()),
+        )
+    return response
 
 
 @app.teardown_request
 def teardown_request(_):
     flask.g.config = None
-    flask.g.db_logic.close()
+    db = flask.g.pop('db', None)
+    if db is not None:
+        AppContext.connection_pool.release(db)
 
 
 def create_metric_config_if_not_exists():
@@ -78,6 +152,61 @@ def main(argv=None):  # pragma: no cover (starts a web server)
         '--processes', type=int, default=5,
         help='Number of processes, does not apply to --debug',
     )
+    mutex.add_argument(
+        '--threads', type=int,
+        help=(
+            'Serve requests with this many threads in each --workers process '
+            '(instead of a process per request).  Suggested for production.'
+        ),
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help=(
+            'Number of worker processes when serving with --threads.  '
+            'Default %(default)s.'
+        ),
+    )
+    parser.add_argument(
+        '--max-idle-connections', type=int, default=DEFAULT_MAX_IDLE,
+        help=(
+            'Number of read-only database connections kept open (per '
+            'process) between requests.  Default %(default)s.'
+        ),
+    )
+    parser.add_argument(
+        '--immutable', action='store_true',
+        help=(
+            'Open the database as immutable, skipping sqlite locking.  Only '
+            'use this when the database is not written to while serving.'
+        ),
+    )
+    parser.add_argument(
+        '--mmap-size', type=int,
+        help='sqlite `mmap_size` pragma (in bytes) for each connection.',
+    )
+    parser.add_argument(
+        '--sqlite-cache-size', type=int,
+        help=(
+            'sqlite `cache_size` pragma for each connection (pages, or KiB '
+            'when negative).'
+        ),
+    )
+    parser.add_argument(
+        '--template-module-directory',
+        help=(
+            'Directory to write compiled templates to, so they are reused '
+            'when the server is restarted.'
+        ),
+    )
+    parser.add_argument(
+        '--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+        help=(
+            'Number of rendered pages cached (per process) until new data is '
+            'generated.  The cache is only used when serving with --threads, '
+            'a process per request (--processes) starts with an empty '
+            'cache.  Default %(default)s.'
+        ),
+    )
     args = parser.parse_args(argv)
 
     if not os.path.exists(args.database_path):
@@ -85,12 +214,50 @@ def main(argv=None):  # pragma: no cover (starts a web server)
         print('Use git-code-debt-generate to create a database.')
         return 1
 
+    # The server only reads the database, migrations are applied by generate
+    db = connect_readonly(args.database_path)
+    try:
+        schema_outdated = DatabaseLogic(db).is_schema_outdated()
+    finally:
+        db.close()
+    if schema_outdated:
+        print('The database schema is out of date: {}'.format(
+            args.database_path,
+        ))
+        print('Run git-code-debt-generate to upgrade it.')
+        return 1
+
     create_metric_config_if_not_exists()
-    with open('metric_config.yaml') as f:
-        contents = yaml.load(f)
-    AppContext.config = Config.from_data(contents)
+    with open('metric_config.yaml', 'rb') as f:
+        contents = f.read()
+    AppContext.config = Config.from_data(yaml.load(contents))
+    AppContext.config_version = hashlib.sha256(contents).hexdigest()
+
+    # Compile templates and discover the widget's metrics before serving
+    # any requests
+    preload_templates(args.template_module_directory)
+    if os.path.exists(GENERATE_CONFIG):
+        widget_config.get()
 
     AppContext.database_path = args.database_path
+    AppContext.connection_pool = ConnectionPool(
+        args.database_path,
+        max_idle=args.max_idle_connections,
+        immutable=args.immutable,
+        mmap_size=args.mmap_size,
+        cache_size=args.sqlite_cache_size,
+    )
+    AppContext.response_cache = LRUCache(maxsize=args.cache_size)
+
+    if args.threads:
+        # The threads of each worker share its loaded config, templates,
+        # response cache and connection pool
+        serve(
+            ThreadPoolWSGIServer('0.0.0.0', args.port, app, args.threads),
+            args.workers,
+        )
+        return
+
     kwargs = {'port': args.port, 'debug': args.debug}
     if not args.debug:
         kwargs['processes'] = args.processes
@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import sqlite3
+import threading
+
+import six
+from six.moves.urllib.parse import urlencode
+from six.moves.urllib.request import pathname2url
+
+
+DEFAULT_MAX_IDLE = 8
+
+
+def connect_readonly(sql_file, immutable=False, pragmas=()):
+    """Opens a read-only sqlite connection which may be used (one at a time)
+    from any thread.
+
+    Args:
+       sql_file - Path to the sqlite database
+       immutable - Whether the database is never written to while open, sqlite
+                   then skips all locking and change detection
+       pragmas - (name, value) pragmas to set on the connection
+    """
+    if six.PY2:  # pragma: no cover (python 2 does not support uri=)
+        db = sqlite3.connect(sql_file, check_same_thread=False)
+    else:
+        params = [('mode', 'ro')]
+        if immutable:
+            params.append(('immutable', '1'))
+        uri = 'file:{}?{}'.format(
+            pathname2url(os.path.abspath(sql_file)), urlencode(params),
+        )
+        db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    for name, value in pragmas:
+        db.execute('PRAGMA {} = {}'.format(name, int(value)))
+    return db
+
+
+class ConnectionPool(object):
+    """Reuses read-only sqlite connections between requests so each request
+    does not pay for opening the database and a cold page cache.
+
+    Args:
+       sql_file - Path to the sqlite database
+       max_idle - The number of connections kept open when not in use
+       immutable - See `connect_readonly`
+       mmap_size - sqlite `mmap_size` pragma (bytes) for each connection
+       cache_size - sqlite `cache_size` pragma for each connection
+    """
+
+    def __init__(
+            self,
+            sql_file,
+            max_idle=DEFAULT_MAX_IDLE,
+            immutable=False,
+            mmap_size=None,
+            cache_size=None,
+    ):
+        self.sql_file = sql_file
+        self.max_idle = max_idle
+        self.immutable = immutable
+        self.pragmas = tuple(
+            (name, value) for name, value in (
+                ('mmap_size', mmap_size), ('cache_size', cache_size),
+            )
+            if value is not None
+        )
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def acquire(self):
+        with self._lock:
+            # Connections must not be shared with a forked process
+            if self._pid != os.getpid():
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop()
+        return connect_readonly(
+            self.sql_file, immutable=self.immutable, pragmas=self.pragmas,
+        )
+
+    def release(self, db):
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(db)
+                return
+        db.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close()
@@ -1,19 +1,50 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import glob
+import os.path
+
 import mako.lookup
 import pkg_resources
 
 
-template_lookup = mako.lookup.TemplateLookup(
-    directories=[
-        pkg_resources.resource_filename('git_code_debt.server', 'templates'),
-    ],
-    default_filters=['html_escape'],
-    imports=['from mako.filters import html_escape'],
+TEMPLATE_DIR = pkg_resources.resource_filename(
+    'git_code_debt.server', 'templates',
 )
 
 
+def get_template_lookup(module_directory=None):
+    """Gets the lookup for the server's templates.
+
+    Args:
+       module_directory - Directory the compiled templates are written to and
+                          reused from (otherwise they are compiled in memory)
+    """
+    return mako.lookup.TemplateLookup(
+        directories=[TEMPLATE_DIR],
+        default_filters=['html_escape'],
+        imports=['from mako.filters import html_escape'],
+        module_directory=module_directory,
+    )
+
+
+template_lookup = get_template_lookup()
+
+
+def preload_templates(module_directory=None):
+    """Compiles every template up front so requests (and processes forked
+    from this one) do not compile them.
+
+    Args:
+       module_directory - See `get_template_lookup`
+    """
+    global template_lookup
+    if module_directory is not None:
+        template_lookup = get_template_lookup(module_directory)
+    for path in sorted(glob.glob(os.path.join(TEMPLATE_DIR, '*.mako'))):
+        template_lookup.get_template(os.path.basename(path))
+
+
 def render_template(template_name, **env):
     template = template_lookup.get_template(template_name)
     return template.render(**env)
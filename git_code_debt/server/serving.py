@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import multiprocessing.pool
+import os
+
+from werkzeug.serving import BaseWSGIServer
+from werkzeug.serving import WSGIRequestHandler
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Close the connection after each response so idle keep-alive
+    # connections do not hold on to one of the threads
+    protocol_version = 'HTTP/1.0'
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """A WSGI server which handles requests with a fixed number of threads.
+    The threads share the process's loaded config, templates and database
+    connections.
+
+    Args:
+       host - Interface to listen on
+       port - Port to listen on (0 picks a free port)
+       app - The WSGI application
+       threads - Number of threads handling requests
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads):
+        BaseWSGIServer.__init__(self, host, port, app, handler=RequestHandler)
+        self.threads = threads
+        self._pool = None
+
+    def serve_forever(self, poll_interval=0.5):
+        # Threads do not survive a fork so each worker starts its own
+        self._pool = multiprocessing.pool.ThreadPool(self.threads)
+        try:
+            BaseWSGIServer.serve_forever(self, poll_interval=poll_interval)
+        finally:
+            self._pool.close()
+            self._pool.join()
+
+    def process_request(self, request, client_address):
+        self._pool.apply_async(
+            self.process_request_thread, (request, client_address),
+        )
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(server, workers):
+    """Serves requests forever with `workers` processes accepting from the
+    server's listening socket.
+    """
+    if workers == 1:
+        server.serve_forever()
+        return
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover (runs in the forked worker)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    server.socket.close()
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        # The workers are interrupted as well
+        pass
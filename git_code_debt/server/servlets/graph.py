@@ -7,31 +7,55 @@ import json
 import flask
 
 from git_code_debt.server.render_mako import render_template
-from git_code_debt.util.time import data_points_for_time_range
+from git_code_debt.util.downsample import downsample
+from git_code_debt.util.downsample import get_bucket_width
+from git_code_debt.util.time import coarsest_period
 from git_code_debt.util.time import to_timestamp
 
 
 graph = flask.Blueprint('graph', __name__)
 
+DEFAULT_POINTS = 250
+# The start and the end of the range are always shown
+MIN_POINTS = 2
+MAX_POINTS = 5000
+
+
+def get_points():
+    """Gets the requested number of points, clamped to a sane range."""
+    try:
+        points = int(flask.request.args.get('points', DEFAULT_POINTS))
+    except ValueError:
+        flask.abort(400)
+    if points <= 0:
+        flask.abort(400)
+    return min(max(points, MIN_POINTS), MAX_POINTS)
+
 
 @graph.route('/graph/<metric_name>')
 def show(metric_name):
     db_logic = flask.g.db_logic
     start_timestamp = int(flask.request.args.get('start'))
     end_timestamp = int(flask.request.args.get('end'))
+    points = get_points()
 
     metric_info = db_logic.get_metric_info(metric_name)
 
-    data_points = data_points_for_time_range(
+    # Long ranges are read from the coarsest rollup finer than a bucket
+    period = coarsest_period(
+        get_bucket_width(start_timestamp, end_timestamp, points),
+    )
+    series = db_logic.get_metric_series(
+        metric_info.id, start_timestamp, end_timestamp + 1, period=period,
+    )
+    metrics = downsample(
+        [(m.date, m.value) for m in series],
         start_timestamp,
         end_timestamp,
-        data_points=250,
+        points,
     )
-    metrics_for_dates = db_logic.metrics_for_dates(metric_info.id, data_points)
 
-    metrics_for_js = sorted({
-        (m.date * 1000, m.value) for m in metrics_for_dates
-    })
+    metrics_for_js = [(date * 1000, value) for date, value in metrics]
 
     return render_template(
         'graph.mako',
@@ -139,11 +139,14 @@ def show():
         (time_name, to_timestamp(today - offset))
         for (time_name, offset) in DATE_NAMES_TO_TIMEDELTAS
     ]
-    current_values = db_logic.get_metrics_for_sha(db_logic.get_latest_sha())
+    # The current values and the values at each offset in one query
+    values = db_logic.get_metrics_for_times(
+        [None] + [timestamp for _, timestamp in offsets],
+    )
+    current_values = values[0]
     metric_data = {
-        time_name:
-        db_logic.get_metrics_for_sha(db_logic.get_sha_for_date(timestamp))
-        for (time_name, timestamp) in offsets
+        time_name: offset_values
+        for (time_name, _), offset_values in zip(offsets, values[1:])
     }
 
     return render_template(
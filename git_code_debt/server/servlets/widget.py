@@ -1,8 +1,11 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import collections
 import io
 import json
+import os.path
+import threading
 
 import flask
 
@@ -18,6 +21,44 @@ from git_code_debt.util import yaml
 
 widget = flask.Blueprint('widget', __name__)
 
+GENERATE_CONFIG = 'generate_config.yaml'
+
+WidgetConfig = collections.namedtuple(
+    'WidgetConfig', ('mtime', 'metric_parsers', 'exclude'),
+)
+
+
+def load_widget_config(filename, mtime):
+    metric_config = GenerateOptions.from_yaml(
+        yaml.load(io.open(filename).read()),
+    )
+    metric_parsers = get_metric_parsers_from_args(
+        metric_config.metric_package_names, skip_defaults=False,
+    )
+    return WidgetConfig(mtime, metric_parsers, metric_config.exclude)
+
+
+class WidgetConfigCache(object):
+    """Holds the metric parsers discovered from the generate config so the
+    widget does not load and discover them for every request.  They are
+    loaded again when the file's modification time changes.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._config = None
+
+    def get(self):
+        mtime = os.path.getmtime(self.filename)
+        with self._lock:
+            if self._config is None or self._config.mtime != mtime:
+                self._config = load_widget_config(self.filename, mtime)
+            return self._config
+
+
+widget_config = WidgetConfigCache(GENERATE_CONFIG)
+
 
 @widget.route('/widget/frame')
 def frame():
@@ -29,13 +70,10 @@ def data():
     metric_names = frozenset(flask.g.config.widget_metrics)
     diff = flask.request.form['diff'].encode('UTF-8')
 
-    metric_config = GenerateOptions.from_yaml(
-        yaml.load(io.open('generate_config.yaml').read()),
-    )
-    parsers = get_metric_parsers_from_args(
-        metric_config.metric_package_names, skip_defaults=False,
+    config = widget_config.get()
+    metrics = get_metrics(
+        Commit.blank, diff, config.metric_parsers, config.exclude,
     )
-    metrics = get_metrics(Commit.blank, diff, parsers, metric_config.exclude)
     metrics = [
         metric for metric in metrics
         if metric.value and metric.name in metric_names
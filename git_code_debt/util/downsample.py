@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import itertools
+
+
+def _bucket_points(points):
+    """Gets the minimum, maximum and last of the points (in order)."""
+    indices = {
+        min(range(len(points)), key=lambda i: points[i][1]),
+        max(range(len(points)), key=lambda i: points[i][1]),
+        len(points) - 1,
+    }
+    return [points[i] for i in sorted(indices)]
+
+
+def _get_buckets(max_points):
+    # The values at the start and the end and 3 points per bucket, each point
+    # after the start may need a step point: 2 * (2 + 3 * buckets) - 1
+    return max((max_points - 3) // 6, 0)
+
+
+def get_bucket_width(start, end, max_points):
+    """Gets the length of time each bucket covers when downsampling."""
+    return (end - start) / max(_get_buckets(max_points), 1)
+
+
+def _add_steps(points):
+    """A metric keeps its value until the next point, a point with the
+    previous value is added where it changes so the graph's lines do not
+    slope between sparse points.
+    """
+    ret = [points[0]]
+    for timestamp, value in points[1:]:
+        prev_timestamp, prev_value = ret[-1]
+        if value != prev_value and timestamp != prev_timestamp:
+            ret.append((timestamp, prev_value))
+        ret.append((timestamp, value))
+    return ret
+
+
+def downsample(points, start, end, max_points):
+    """Reduces (timestamp, value) points to at most `max_points` points.
+
+    The range is split into buckets and the minimum, maximum and last point
+    of each bucket are kept so spikes between buckets are not lost.  The
+    value at the start and at the end of the range are always included.
+    Step points are added where the value changes (see `_add_steps`) when
+    the budget allows for any buckets.
+
+    Args:
+       points - (timestamp, value) sorted by timestamp, a point before `start`
+                is the value at `start` (otherwise 0)
+       start - Timestamp of the start of the range
+       end - Timestamp of the end of the range
+       max_points - The maximum number of points to return (at least 2)
+    """
+    assert max_points >= 2
+    buckets = _get_buckets(max_points)
+    if not buckets:
+        # Only the values at the start and at the end fit
+        start_value = end_value = 0
+        for timestamp, value in points:
+            if timestamp < start:
+                start_value = value
+            end_value = value
+        if start < end:
+            return [(start, start_value), (end, end_value)]
+        else:
+            return [(start, start_value)]
+
+    width = get_bucket_width(start, end, max_points)
+
+    def get_bucket(point):
+        if point[0] < start:
+            return -1
+        elif width:
+            return min(int((point[0] - start) // width), buckets - 1)
+        else:
+            return 0
+
+    ret = [(start, 0)]
+    for bucket, bucket_points in itertools.groupby(points, key=get_bucket):
+        bucket_points = list(bucket_points)
+        if bucket == -1:
+            ret = [(start, bucket_points[-1][1])]
+        else:
+            ret.extend(_bucket_points(bucket_points))
+    if ret[-1][0] < end:
+        ret.append((end, ret[-1][1]))
+    return _add_steps(ret)
@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import collections
+import threading
+
+
+class LRUCache(object):
+    """A thread-safe mapping which holds at most `maxsize` items.  When full,
+    the least recently used item is evicted.
+    """
+
+    def __init__(self, maxsize):
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            # Move the item to the most recently used position
+            value = self._data[key] = self._data.pop(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import collections
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+
+_DONE = object()
+
+
+def _produce(iterable, items, stop):
+    try:
+        for item in iterable:
+            items.put((item, None))
+            if stop.is_set():
+                break
+        items.put((_DONE, None))
+    except BaseException:
+        items.put((_DONE, sys.exc_info()))
+    finally:
+        # Stops a generator's underlying process (such as `git log`)
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def prefetch(iterable, maxsize):
+    """Yields the items of `iterable`, which is read in a separate thread up
+    to `maxsize` items ahead of the consumer.  Exceptions raised by the
+    iterable are raised to the consumer.
+
+    Args:
+       iterable - Some iterable, it is only advanced by the thread
+       maxsize - The number of items read ahead (greater than 0)
+    """
+    assert maxsize > 0
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    thread = threading.Thread(target=_produce, args=(iterable, items, stop))
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, exc_info = items.get()
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            elif item is _DONE:
+                break
+            yield item
+    finally:
+        # The consumer may stop early, unblock the thread so it can finish
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get(timeout=.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+def ordered_imap(apply_async, func, iterable, max_pending):
+    """Like `imap`, but at most `max_pending` items are queued to or waiting
+    to be collected from the workers, so neither the input nor the results
+    pile up in memory when one side is faster than the other.
+
+    Args:
+       apply_async - Submits `func(*args)`, such as `Pool.apply_async`
+       func - The function to apply to each item
+       iterable - The items, read in a separate thread (see `prefetch`)
+       max_pending - The number of items in progress (greater than 0)
+    """
+    pending = collections.deque()
+    for item in prefetch(iterable, max_pending):
+        pending.append(apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
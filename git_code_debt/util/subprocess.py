@@ -2,6 +2,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import subprocess
+import tempfile
 
 
 class CalledProcessError(RuntimeError):
@@ -27,3 +28,80 @@ def cmd_output(*cmd, **kwargs):
         stdout = stdout.decode(encoding)
 
     return stdout
+
+
+def cmd_output_lines(*cmd, **kwargs):
+    """Like `cmd_output` but yields the lines of stdout (as bytes) as they
+    are produced instead of buffering the entire output.
+    """
+    # stderr is only read once stdout is exhausted, a pipe could fill up and
+    # block the process
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            **kwargs
+        )
+        try:
+            for line in iter(proc.stdout.readline, b''):
+                yield line
+            retcode = proc.wait()
+        finally:
+            # The consumer stopped iterating before the process finished
+            if proc.returncode is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+    if retcode:
+        raise CalledProcessError(cmd, retcode, None, stderr)
+
+
+class BatchProcess(object):
+    """A long-lived process which is fed requests over stdin and answers
+    over stdout (such as `git cat-file --batch`).
+    """
+
+    def __init__(self, *cmd, **kwargs):
+        self.cmd = cmd
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            **kwargs
+        )
+
+    @property
+    def alive(self):
+        return self._proc.poll() is None
+
+    def _died(self):
+        retcode = self._proc.wait()
+        raise CalledProcessError(self.cmd, retcode, None, None)
+
+    def write(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (IOError, OSError):
+            self._died()
+
+    def readline(self):
+        line = self._proc.stdout.readline()
+        if not line:
+            self._died()
+        return line
+
+    def read(self, n):
+        data = self._proc.stdout.read(n)
+        if len(data) != n:
+            self._died()
+        return data
+
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.stdout.close()
+        self._proc.wait()
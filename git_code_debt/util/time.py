@@ -3,6 +3,15 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import calendar
+import datetime
+
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+# 1970-01-05, the first Monday after the epoch
+FIRST_MONDAY = 4 * DAY
+
+# Rollup periods from finest to coarsest with their (approximate) length
+ROLLUP_PERIODS = (('day', DAY), ('week', WEEK), ('month', 30 * DAY))
 
 
 def to_timestamp(dt):
@@ -12,3 +21,38 @@ def to_timestamp(dt):
 def data_points_for_time_range(start_timestamp, end_timestamp, data_points=25):
     interval = ((end_timestamp - start_timestamp) // data_points) or 1
     return tuple(range(start_timestamp, end_timestamp + interval, interval))
+
+
+def period_start(period, timestamp):
+    """Gets the start of the day / week / month (UTC) containing `timestamp`."""
+    if period == 'day':
+        return timestamp - timestamp % DAY
+    elif period == 'week':
+        return timestamp - (timestamp - FIRST_MONDAY) % WEEK
+    else:
+        dt = datetime.datetime.utcfromtimestamp(timestamp)
+        return to_timestamp(
+            dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        )
+
+
+def period_end(period, timestamp):
+    """Gets the start of the day / week / month after the one containing
+    `timestamp`.
+    """
+    if period == 'day':
+        return period_start(period, timestamp) + DAY
+    elif period == 'week':
+        return period_start(period, timestamp) + WEEK
+    else:
+        # Every month is shorter than 32 days
+        return period_start(period, period_start(period, timestamp) + 32 * DAY)
+
+
+def coarsest_period(length):
+    """Gets the coarsest rollup period no longer than `length` (or None)."""
+    ret = None
+    for period, period_length in ROLLUP_PERIODS:
+        if period_length <= length:
+            ret = period
+    return ret
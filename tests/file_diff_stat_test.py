@@ -1,9 +1,16 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import re
+
+import mock
+import pytest
+
 from git_code_debt.discovery import get_metric_parsers
+from git_code_debt.file_diff_stat import DiffLines
 from git_code_debt.file_diff_stat import FileDiffStat
 from git_code_debt.file_diff_stat import get_file_diff_stats_from_output
+from git_code_debt.file_diff_stat import iter_file_diff_stats_from_output
 from git_code_debt.file_diff_stat import SpecialFile
 from git_code_debt.file_diff_stat import SpecialFileType
 from git_code_debt.file_diff_stat import Status
@@ -200,6 +207,11 @@ def test_get_file_diff_stats_from_output():
     ]
 
 
+def test_no_trailing_newline():
+    ret = get_file_diff_stats_from_output(SAMPLE_OUTPUT.rstrip(b'\n'))
+    assert ret == get_file_diff_stats_from_output(SAMPLE_OUTPUT)
+
+
 def test_does_not_choke_on_empty():
     ret = get_file_diff_stats_from_output(MERGE_COMMIT_OUTPUT)
     assert ret == []
@@ -443,3 +455,76 @@ def test_modified_binary_commit():
             ),
         ),
     ]
+
+
+def test_iter_file_diff_stats_is_lazy():
+    ret = iter_file_diff_stats_from_output(SAMPLE_OUTPUT_MULTIPLE_FILES)
+    first = next(ret)
+    assert first.status is Status.ADDED
+    assert next(ret).status is Status.DELETED
+    assert next(ret, None) is None
+
+
+def test_iter_file_diff_stats_exclude():
+    output = ADD_SUBMODULE_COMMIT + COMMIT_ENDING_WITH_BINARY_FILES
+    exclude = re.compile(b'^(htdocs/css|verifycppbraces)')
+    ret = list(iter_file_diff_stats_from_output(output, exclude))
+    assert [x.path for x in ret] == [b'.gitmodules', b'htdocs/i/p.gif']
+
+
+def test_iter_file_diff_stats_exclude_skips_parsing():
+    # This section would fail to parse (it has no mode)
+    output = b'diff --git a/vendor/f b/vendor/f\n' + SAMPLE_OUTPUT
+    exclude = re.compile(b'^vendor/')
+    ret = list(iter_file_diff_stats_from_output(output, exclude))
+    assert ret == get_file_diff_stats_from_output(SAMPLE_OUTPUT)
+
+
+def test_lines_reference_original_output():
+    ret, = get_file_diff_stats_from_output(SAMPLE_OUTPUT)
+    assert ret.lines_added._output is SAMPLE_OUTPUT
+    assert ret.lines_removed._output is SAMPLE_OUTPUT
+
+
+def test_diff_lines_sequence():
+    lines = DiffLines(b'+foo\n-bar\n+baz', [1, 6, 11])
+    assert len(lines) == 3
+    assert list(lines) == [b'foo', b'bar', b'baz']
+    assert lines[0] == b'foo'
+    assert lines[-1] == b'baz'
+    assert lines[1:] == [b'bar', b'baz']
+    assert b'bar' in lines
+    with pytest.raises(IndexError):
+        lines[3]
+
+
+def test_diff_lines_kept_after_second_pass():
+    lines = DiffLines(b'+foo\n-bar\n', [1, 6])
+    assert list(lines) == [b'foo', b'bar']
+    assert lines._lines is None
+    assert list(lines) == [b'foo', b'bar']
+    with mock.patch.object(DiffLines, '_line') as line_mock:
+        assert list(lines) == [b'foo', b'bar']
+        assert lines[1] == b'bar'
+        assert lines[:1] == [b'foo']
+    assert not line_mock.called
+
+
+def test_diff_lines_large_offsets():
+    offset = 2 ** 40
+    assert DiffLines(b'', [offset])._offsets[0] == offset
+
+
+def test_diff_lines_equality():
+    lines = DiffLines(b'+foo\n', [1])
+    assert lines == [b'foo']
+    assert lines == (b'foo',)
+    assert lines == DiffLines(b' x\n+foo\n', [4])
+    assert lines != [b'bar']
+    assert lines != b'foo'
+    assert not lines == b'foo'
+    assert DiffLines(b'') == []
+
+
+def test_diff_lines_repr():
+    assert repr(DiffLines(b'+foo\n', [1])) == "DiffLines([{!r}])".format(b'foo')
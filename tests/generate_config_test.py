@@ -21,6 +21,8 @@ def test_with_all_options_specified():
         'repo': '.',
         'database': 'database.db',
         'exclude': '^vendor/',
+        'storage_mode': 'snapshot',
+        'snapshot_interval': 50,
     })
     assert ret == GenerateOptions(
         skip_default_metrics=True,
@@ -28,9 +30,27 @@ def test_with_all_options_specified():
         repo='.',
         database='database.db',
         exclude=re.compile(b'^vendor/'),
+        storage_mode='snapshot',
+        snapshot_interval=50,
     )
 
 
+def test_invalid_storage_mode():
+    with pytest.raises(cfgv.ValidationError):
+        GenerateOptions.from_yaml({
+            'repo': '.', 'database': 'database.db', 'storage_mode': 'wat',
+        })
+
+
+@pytest.mark.parametrize('snapshot_interval', (0, -1, '5'))
+def test_invalid_snapshot_interval(snapshot_interval):
+    with pytest.raises(cfgv.ValidationError):
+        GenerateOptions.from_yaml({
+            'repo': '.', 'database': 'database.db',
+            'snapshot_interval': snapshot_interval,
+        })
+
+
 def test_minimal_defaults():
     ret = GenerateOptions.from_yaml({'repo': './', 'database': 'database.db'})
     assert ret == GenerateOptions(
@@ -39,4 +59,6 @@ def test_minimal_defaults():
         repo='./',
         database='database.db',
         exclude=re.compile(b'^$'),
+        storage_mode='full',
+        snapshot_interval=100,
     )
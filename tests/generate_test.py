@@ -1,22 +1,39 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import array
 import collections
 import io
 import os.path
+import pickle
 import re
+import sqlite3
 
+import mock
 import pytest
 
+from git_code_debt import generate
+from git_code_debt.database import DatabaseLogic
+from git_code_debt.database import STORAGE_FULL
+from git_code_debt.database import STORAGE_SNAPSHOT
+from git_code_debt.database import STORAGE_SPARSE
 from git_code_debt.database import WriteableDatabaseLogic
 from git_code_debt.generate import _get_metrics_inner
+from git_code_debt.generate import get_metrics
 from git_code_debt.generate import get_options_from_config
+from git_code_debt.generate import get_rewind_point
+from git_code_debt.generate import get_rollups
 from git_code_debt.generate import increment_metrics
 from git_code_debt.generate import main
 from git_code_debt.generate import mapper
+from git_code_debt.generate import pack_metrics
 from git_code_debt.generate import populate_metric_ids
+from git_code_debt.generate import unpack_metrics
 from git_code_debt.metric import Metric
+from git_code_debt.metrics.imports import PythonImportCount
 from git_code_debt.metrics.lines import LinesOfCodeParser
+from git_code_debt.metrics.todo import TODOCount
+from git_code_debt.repo_parser import Commit
 from git_code_debt.repo_parser import RepoParser
 from git_code_debt.util.subprocess import cmd_output
 from testing.utilities.cwd import cwd
@@ -24,37 +41,145 @@ from testing.utilities.cwd import cwd
 
 def test_increment_metrics_first_time():
     metric_values = collections.Counter()
-    metrics = [Metric('foo', 1), Metric('bar', 2)]
-    increment_metrics(metric_values, {'foo': 0, 'bar': 1}, metrics)
+    increment_metrics(metric_values, [(0, 1), (1, 2)])
     assert metric_values == {0: 1, 1: 2}
 
 
 def test_increment_metrics_already_there():
     metric_values = collections.Counter({0: 2, 1: 3})
-    metrics = [Metric('foo', 1), Metric('bar', 2)]
-    increment_metrics(metric_values, {'foo': 0, 'bar': 1}, metrics)
+    increment_metrics(metric_values, [(0, 1), (1, 2)])
     assert metric_values == {0: 3, 1: 5}
 
 
+def test_pack_metrics():
+    metrics = [Metric('foo', 0), Metric('bar', -2), Metric('baz', 2 ** 40)]
+    packed = pack_metrics(metrics, {'foo': 0, 'bar': 1, 'baz': 2})
+    # Metrics which did not change are not included
+    assert packed == array.array(packed.typecode, [1, -2, 2, 2 ** 40])
+    assert pickle.loads(pickle.dumps(packed)) == packed
+    assert unpack_metrics(packed) == [(1, -2), (2, 2 ** 40)]
+
+
+def test_unpack_metrics_empty():
+    assert unpack_metrics(pack_metrics([], {})) == []
+
+
+def test_get_rollups_new_buckets():
+    # 2013-01-02 03:04:05 UTC
+    commit = Commit('a' * 40, 1357095845)
+    metric_values = collections.Counter({0: 3, 1: 5})
+    metrics = [(0, 0), (1, -2)]
+    ret = get_rollups(commit, None, metric_values, metrics)
+    assert ret == [
+        ('day', 1357084800, 1, 5, 5, 5),
+        ('week', 1356912000, 1, 5, 5, 5),
+        ('month', 1356998400, 1, 5, 5, 5),
+    ]
+
+
+def test_get_rollups_continued_buckets():
+    commit = Commit('a' * 40, 1357095845)
+    metric_values = collections.Counter({0: 3, 1: 5})
+    metrics = [(0, 0), (1, -2)]
+    # The previous commit is on the same day
+    ret = get_rollups(commit, 1357095845 - 60, metric_values, metrics)
+    assert ret == [
+        ('day', 1357084800, 1, 5, 7, 5),
+        ('week', 1356912000, 1, 5, 7, 5),
+        ('month', 1356998400, 1, 5, 7, 5),
+    ]
+
+
+# 2013-01-02 03:04:05 UTC
+JAN_2 = 1357095845
+DAY = 24 * 60 * 60
+
+
+def test_get_rewind_point():
+    stored = [('d', JAN_2 + 60 * DAY), ('c', JAN_2 + 40 * DAY), ('b', JAN_2)]
+    sha, rollup_buckets = get_rewind_point(iter(stored), {'a', 'b', 'c'})
+    assert sha == 'c'
+    # 2013-03-03 (a sunday)
+    assert rollup_buckets == {
+        'day': 1362268800, 'week': 1361750400, 'month': 1362096000,
+    }
+
+
+def test_get_rewind_point_same_buckets():
+    # `c` is in the same week and month as the removed commit
+    stored = [('d', JAN_2 + 3 * DAY), ('c', JAN_2 + DAY), ('b', JAN_2 - 3 * DAY)]
+    sha, rollup_buckets = get_rewind_point(iter(stored), {'a', 'b', 'c'})
+    assert sha == 'b'
+    assert rollup_buckets['day'] == 1357084800 + DAY
+    assert rollup_buckets['week'] == 1356912000
+    assert rollup_buckets['month'] == 1356998400
+
+
+def test_get_rewind_point_not_in_history():
+    stored = [('d', JAN_2 + 40 * DAY), ('c', JAN_2)]
+    sha, rollup_buckets = get_rewind_point(iter(stored), {'a', 'b'})
+    assert sha is None
+    assert rollup_buckets['month'] == 1356998400
+
+
+def test_get_rewind_point_not_rewritten():
+    assert get_rewind_point(iter([('b', JAN_2)]), {'a', 'b'}) == ('b', {})
+
+
+def test_get_metrics_line_counters_and_other_parsers():
+    diff = (
+        b'diff --git a/f.py b/f.py\n'
+        b'new file mode 100644\n'
+        b'index 0000000..6d1cb8f\n'
+        b'--- /dev/null\n'
+        b'+++ b/f.py\n'
+        b'@@ -0,0 +1,2 @@\n'
+        b'+import os\n'
+        b'+# TO' b'DO: remove\n'
+    )
+    metrics = get_metrics(
+        Commit.blank, diff,
+        [LinesOfCodeParser, PythonImportCount, TODOCount],
+        re.compile(b'^$'),
+    )
+    assert Metric('TotalLinesOfCode', 2) in metrics
+    assert Metric('PythonImportCount', 1) in metrics
+    assert Metric('TODOCount', 1) in metrics
+
+
+@pytest.fixture
+def worker_initialized():
+    with mock.patch.dict(generate._worker_context):
+        # Only TotalLinesOfCode has an id for these tests
+        metric_mapping = collections.defaultdict(int, TotalLinesOfCode=7)
+        generate._init_worker(
+            [LinesOfCodeParser], re.compile(b'^$'), metric_mapping,
+        )
+        yield
+
+
+@pytest.mark.usefixtures('worker_initialized')
 def test_get_metrics_inner_first_commit(cloneable_with_commits):
     repo_parser = RepoParser(cloneable_with_commits.path)
     with repo_parser.repo_checked_out():
-        metrics = _get_metrics_inner((
-            None, cloneable_with_commits.commits[0],
-            repo_parser, [LinesOfCodeParser], re.compile(b'^$'),
-        ))
-        assert Metric(name='TotalLinesOfCode', value=0) in metrics
+        commit = cloneable_with_commits.commits[0]
+        diff = repo_parser.get_original_commit(commit.sha)
+        ret_commit, packed = _get_metrics_inner((commit, diff))
+        assert ret_commit == commit
+        # The (empty) first commit does not change any metric
+        assert unpack_metrics(packed) == []
 
 
+@pytest.mark.usefixtures('worker_initialized')
 def test_get_metrics_inner_nth_commit(cloneable_with_commits):
     repo_parser = RepoParser(cloneable_with_commits.path)
     with repo_parser.repo_checked_out():
-        metrics = _get_metrics_inner((
-            cloneable_with_commits.commits[-2],
-            cloneable_with_commits.commits[-1],
-            repo_parser, [LinesOfCodeParser], re.compile(b'^$'),
-        ))
-        assert Metric(name='TotalLinesOfCode', value=2) in metrics
+        diff = repo_parser.get_commit_diff(
+            cloneable_with_commits.commits[-2].sha,
+            cloneable_with_commits.commits[-1].sha,
+        )
+        _, packed = _get_metrics_inner((cloneable_with_commits.commits[-1], diff))
+        assert (7, 2) in unpack_metrics(packed)
 
 
 def square(x):
@@ -68,6 +193,26 @@ def test_mapper(jobs):
         assert ret == (9, 25, 81)
 
 
+def get_worker_context(_):
+    return dict(generate._worker_context)
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_mapper_initializer(jobs):
+    with mock.patch.dict(generate._worker_context):
+        with mapper(
+                jobs,
+                initializer=generate._init_worker,
+                initargs=([LinesOfCodeParser], None, {'foo': 1}),
+        ) as do_map:
+            contexts = list(do_map(get_worker_context, range(4)))
+    assert contexts == [{
+        'metric_parsers': [LinesOfCodeParser],
+        'exclude': None,
+        'metric_mapping': {'foo': 1},
+    }] * 4
+
+
 def test_generate_integration(sandbox, cloneable):
     main(('-C', sandbox.gen_config(repo=cloneable)))
 
@@ -109,6 +254,75 @@ def test_generate_new_data_created(sandbox, cloneable_with_commits):
     assert after_data_count > before_data_count
 
 
+def test_generate_small_batches_and_pragmas(sandbox, cloneable_with_commits):
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    assert not main((
+        '-C', cfg, '--batch-size', '2',
+        '--journal-mode', 'wal', '--synchronous', 'normal',
+    ))
+    assert get_metric_data_count(sandbox) > 0
+    with sandbox.db_logic() as db_logic:
+        assert db_logic._fetch_one('PRAGMA journal_mode') == ('wal',)
+
+
+@pytest.mark.parametrize('batch_size', ('0', '-1', 'x'))
+def test_generate_invalid_batch_size(batch_size, capsys):
+    with pytest.raises(SystemExit):
+        main(('--batch-size', batch_size))
+    _, err = capsys.readouterr()
+    assert 'argument --batch-size' in err
+
+
+class CountingConnection(object):
+    """Counts the `executemany` calls of each statement."""
+
+    def __init__(self, db):
+        self._db = db
+        self.executemany_calls = collections.Counter()
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __enter__(self):
+        return self._db.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._db.__exit__(exc_type, exc_value, traceback)
+
+    def executemany(self, sql, values):
+        self.executemany_calls[sql] += 1
+        return self._db.executemany(sql, values)
+
+
+@pytest.mark.parametrize(
+    'storage_mode', (STORAGE_FULL, STORAGE_SPARSE, STORAGE_SNAPSHOT),
+)
+def test_generate_one_executemany_per_statement_per_batch(
+        sandbox, cloneable_with_commits, storage_mode,
+):
+    cfg = sandbox.gen_config(
+        repo=cloneable_with_commits.path,
+        database=os.path.join(sandbox.directory, 'batched.db'),
+        storage_mode=storage_mode,
+        snapshot_interval=1,
+    )
+    connections = []
+
+    def for_sqlite(sql_file):
+        connections.append(CountingConnection(sqlite3.connect(sql_file)))
+        return WriteableDatabaseLogic(connections[-1])
+
+    with mock.patch.object(
+            WriteableDatabaseLogic, 'for_sqlite', side_effect=for_sqlite,
+    ):
+        assert not main(('-C', cfg, '-j', '1'))
+    # Creating the database, then loading the data
+    _, load_data_connection = connections
+    calls = load_data_connection.executemany_calls
+    assert calls
+    assert set(calls.values()) == {1}
+
+
 def test_regression_for_issue_10(sandbox, cloneable):
     # Create a commit, then create another commit at a previous time
     with cwd(cloneable):
@@ -165,11 +379,37 @@ def test_internal_zero_populated(sandbox, cloneable):
             'INNER JOIN metric_names ON\n'
             '    metric_data.metric_id == metric_names.id\n'
             'WHERE name = "TotalLinesOfCode_python"\n'
+            'ORDER BY metric_data.ROWID\n'
         )
         vals = [x for x, in db_logic._fetch_all(query)]
         assert vals == [1, 0, 1]
 
 
+def test_merge_commits_use_first_parent_diff(sandbox, cloneable):
+    with cwd(cloneable):
+        cmd_output('git', 'checkout', '-b', 'branch')
+        with io.open('f.py', 'w') as f:
+            f.write('import os\n')
+        cmd_output('git', 'add', 'f.py')
+        cmd_output('git', 'commit', '-m', 'add f')
+        cmd_output('git', 'checkout', '-')
+        cmd_output('git', 'merge', '--no-ff', '--no-edit', 'branch')
+
+    assert not main(('-C', sandbox.gen_config(repo=cloneable)))
+    with sandbox.db_logic() as db_logic:
+        query = (
+            'SELECT running_value\n'
+            'FROM metric_data\n'
+            'INNER JOIN metric_names ON\n'
+            '    metric_data.metric_id == metric_names.id\n'
+            'WHERE name = "PythonImportCount"\n'
+        )
+        # Only the first-parent history is considered: the side branch's
+        # commit is skipped and the merge introduces the import
+        vals = [x for x, in db_logic._fetch_all(query)]
+        assert vals == [1]
+
+
 def test_exclude_pattern(sandbox, cloneable_with_commits):
     cfg = sandbox.gen_config(
         repo=cloneable_with_commits.path, exclude=r'\.tmpl$',
@@ -189,6 +429,321 @@ def test_exclude_pattern(sandbox, cloneable_with_commits):
         assert val == 2
 
 
+def _generate_full_and_other(sandbox, repo, storage_mode):
+    other_db_path = os.path.join(sandbox.directory, 'other.db')
+    assert not main(('-C', sandbox.gen_config(repo=repo)))
+    assert not main((
+        '-C',
+        sandbox.gen_config(
+            repo=repo,
+            database=other_db_path,
+            storage_mode=storage_mode,
+            snapshot_interval=2,
+        ),
+    ))
+    return other_db_path
+
+
+def _assert_same_values(sandbox, other_db_path, storage_mode, commits):
+    with sandbox.db_logic() as full, \
+            DatabaseLogic.for_sqlite(other_db_path) as other:
+        assert full.storage_mode == 'full'
+        assert other.storage_mode == storage_mode
+        assert other.get_previous_sha() == full.get_previous_sha()
+        assert other.get_latest_sha() == full.get_latest_sha()
+        for commit in commits:
+            # Commits before any metric has data have no rows in full mode
+            if full.get_metric_values(commit.sha):
+                assert (
+                    other.get_sha_for_date(commit.date) ==
+                    full.get_sha_for_date(commit.date)
+                )
+            assert (
+                other.get_metric_values(commit.sha) ==
+                full.get_metric_values(commit.sha)
+            )
+            assert (
+                other.get_metrics_for_sha(commit.sha) ==
+                full.get_metrics_for_sha(commit.sha)
+            )
+        timestamps = [None] + [commit.date for commit in commits]
+        assert (
+            other.get_metrics_for_times(timestamps) ==
+            full.get_metrics_for_times(timestamps) ==
+            [full.get_metrics_for_sha(full.get_latest_sha())] + [
+                full.get_metrics_for_sha(full.get_sha_for_date(commit.date))
+                for commit in commits
+            ]
+        )
+        for metric_name in ('TotalLinesOfCode', 'TODOCount'):
+            assert (
+                other.get_first_data_timestamp(metric_name) ==
+                full.get_first_data_timestamp(metric_name)
+            )
+            metric_id = full.get_metric_mapping()[metric_name]
+            dates = [commits[0].date - 1] + [c.date + 1 for c in commits]
+            assert (
+                other.metrics_for_dates(metric_id, dates) ==
+                full.metrics_for_dates(metric_id, dates)
+            )
+            # Sparse storage only has the rows where the value changes
+            if storage_mode == 'snapshot':
+                assert (
+                    other.get_metric_series(metric_id, 0, dates[-1]) ==
+                    full.get_metric_series(metric_id, 0, dates[-1])
+                )
+            assert (
+                sorted(other.get_major_changes_for_metric(
+                    0, commits[-1].date + 1, metric_id,
+                )) ==
+                sorted(full.get_major_changes_for_metric(
+                    0, commits[-1].date + 1, metric_id,
+                ))
+            )
+
+
+def _count(db_path, table):
+    with DatabaseLogic.for_sqlite(db_path) as db_logic:
+        return db_logic._fetch_one('SELECT COUNT(*) FROM {}'.format(table))[0]
+
+
+@pytest.mark.parametrize('storage_mode', ('sparse', 'snapshot'))
+def test_generate_storage_modes(sandbox, cloneable_with_commits, storage_mode):
+    other_db_path = _generate_full_and_other(
+        sandbox, cloneable_with_commits.path, storage_mode,
+    )
+    commits = cloneable_with_commits.commits
+    assert _count(other_db_path, 'commits') == len(commits)
+    _assert_same_values(sandbox, other_db_path, storage_mode, commits)
+
+
+def test_generate_sparse_storage(sandbox, cloneable_with_commits):
+    sparse_db_path = _generate_full_and_other(
+        sandbox, cloneable_with_commits.path, 'sparse',
+    )
+    sparse_count = _count(sparse_db_path, 'metric_data')
+    assert 0 < sparse_count < get_metric_data_count(sandbox)
+    assert _count(sparse_db_path, 'metric_snapshots') == 0
+
+
+def test_generate_snapshot_storage(sandbox, cloneable_with_commits):
+    snapshot_db_path = _generate_full_and_other(
+        sandbox, cloneable_with_commits.path, 'snapshot',
+    )
+    assert _count(snapshot_db_path, 'metric_data') == 0
+    with DatabaseLogic.for_sqlite(snapshot_db_path) as db_logic:
+        snapshot_commits = db_logic._fetch_all(
+            'SELECT DISTINCT commit_id FROM metric_snapshots ORDER BY commit_id',
+        )
+    # Every 2 commits (the first snapshot has no metrics with data)
+    assert snapshot_commits == [(4,)]
+
+
+@pytest.mark.parametrize('storage_mode', ('sparse', 'snapshot'))
+def test_generate_storage_modes_new_data(
+        sandbox, cloneable_with_commits, storage_mode,
+):
+    other_db_path = _generate_full_and_other(
+        sandbox, cloneable_with_commits.path, storage_mode,
+    )
+    with cwd(cloneable_with_commits.path):
+        # A commit which does not change any metric
+        cmd_output('git', 'commit', '--allow-empty', '-m', 'empty')
+        with io.open('f.py', 'w') as f:
+            f.write('# TODO\n')
+        cmd_output('git', 'add', 'f.py')
+        cmd_output('git', 'commit', '-m', 'add f')
+    repo_parser = RepoParser(cloneable_with_commits.path)
+    with repo_parser.repo_checked_out():
+        commits = repo_parser.get_commits()
+    _generate_full_and_other(sandbox, cloneable_with_commits.path, storage_mode)
+    _assert_same_values(sandbox, other_db_path, storage_mode, commits)
+
+
+def _commit_at(filename, contents, timestamp):
+    with io.open(filename, 'w') as f:
+        f.write(contents)
+    cmd_output('git', 'add', filename)
+    date = '@{} +0000'.format(timestamp)
+    cmd_output(
+        'git', 'commit', '-m', 'add {}'.format(filename),
+        env=dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date),
+    )
+    return cmd_output('git', 'rev-parse', 'HEAD').strip()
+
+
+def _tables(db_path):
+    with DatabaseLogic.for_sqlite(db_path) as db_logic:
+        return {
+            table: sorted(db_logic._fetch_all('SELECT * FROM {}'.format(table)))
+            for table in (
+                'commits', 'metric_changes', 'metric_data', 'metric_names',
+                'metric_rollups', 'metric_snapshots',
+            )
+        }
+
+
+@pytest.mark.parametrize('storage_mode', ('full', 'sparse', 'snapshot'))
+def test_generate_after_history_rewritten(sandbox, cloneable, storage_mode):
+    with cwd(cloneable):
+        kept = _commit_at('a.py', '# TODO\n', JAN_2)
+        _commit_at('b.py', 'import os\n', JAN_2 + 40 * DAY)
+        _commit_at('c.py', '# TODO\n', JAN_2 + 41 * DAY)
+
+    def gen_config(database):
+        return sandbox.gen_config(
+            repo=cloneable,
+            database=os.path.join(sandbox.directory, database),
+            storage_mode=storage_mode,
+            snapshot_interval=1,
+        )
+
+    assert not main(('-C', gen_config('rewritten.db')))
+
+    # Force push a different history after the first commit
+    with cwd(cloneable):
+        cmd_output('git', 'reset', '--hard', kept)
+        _commit_at('d.tmpl', 'hello\n', JAN_2 + 40 * DAY)
+
+    with mock.patch.object(
+            RepoParser, 'get_commit_diffs',
+            autospec=True, side_effect=RepoParser.get_commit_diffs,
+    ) as get_commit_diffs:
+        assert not main(('-C', gen_config('rewritten.db')))
+    (_, since_sha), _ = get_commit_diffs.call_args
+    assert since_sha == kept
+
+    # The same as generating from nothing
+    assert not main(('-C', gen_config('other.db')))
+    tables = _tables(os.path.join(sandbox.directory, 'rewritten.db'))
+    assert tables == _tables(os.path.join(sandbox.directory, 'other.db'))
+    assert not any(
+        name == 'PythonImportCount' and has_data
+        for _, name, has_data, _ in tables['metric_names']
+    )
+
+
+def test_generate_after_history_replaced(
+        sandbox, cloneable_with_commits, capsys,
+):
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    assert not main(('-C', cfg))
+    previous_sha = cloneable_with_commits.commits[-1].sha
+    with cwd(cloneable_with_commits.path):
+        cmd_output('git', 'checkout', '--orphan', 'new')
+        cmd_output('git', 'rm', '-rf', '--cached', '.')
+        _commit_at('a.py', '# TODO\n', JAN_2)
+        cmd_output('git', 'branch', '-f', 'master', 'new')
+        cmd_output('git', 'checkout', 'master')
+    capsys.readouterr()
+    assert not main(('-C', cfg))
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert err == (
+        '{} is no longer in the history, generating again after the first '
+        'commit\n'.format(previous_sha)
+    )
+    with sandbox.db_logic() as db_logic:
+        assert db_logic._fetch_all(
+            'SELECT DISTINCT sha FROM metric_data',
+        ) == [(db_logic.get_previous_sha(),)]
+
+
+def test_generate_resumes_after_interrupted(sandbox, cloneable_with_commits):
+    commits = cloneable_with_commits.commits
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    with mock.patch.object(
+            generate, 'get_rollups',
+            side_effect=(
+                [[]] * 3 + [KeyboardInterrupt('killed on the 4th commit')]
+            ),
+    ):
+        with pytest.raises(KeyboardInterrupt):
+            main(('-C', cfg, '--batch-size', '2'))
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() == commits[1].sha
+        assert db_logic.get_metric_values(commits[2].sha) == {}
+
+    with mock.patch.object(
+            RepoParser, 'get_commit_diffs',
+            autospec=True, side_effect=RepoParser.get_commit_diffs,
+    ) as get_commit_diffs:
+        assert not main(('-C', cfg, '--batch-size', '2'))
+    (_, since_sha), _ = get_commit_diffs.call_args
+    assert since_sha == commits[1].sha
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() == commits[-1].sha
+
+    other_db_path = os.path.join(sandbox.directory, 'other.db')
+    main((
+        '-C',
+        sandbox.gen_config(
+            repo=cloneable_with_commits.path, database=other_db_path,
+        ),
+    ))
+    # The rollups written before the interruption were mocked out
+    tables = _tables(sandbox.db_path)
+    other_tables = _tables(other_db_path)
+    tables.pop('metric_rollups')
+    other_tables.pop('metric_rollups')
+    assert tables == other_tables
+
+
+def test_generate_resumes_before_any_data(sandbox, cloneable_with_commits):
+    # The first commit has no metric data so it is only in the marker
+    root = cloneable_with_commits.commits[0]
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    with mock.patch.object(
+            generate, 'get_rollups', side_effect=([], KeyboardInterrupt),
+    ):
+        with pytest.raises(KeyboardInterrupt):
+            main(('-C', cfg, '--batch-size', '1'))
+    assert get_metric_data_count(sandbox) == 0
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() == root.sha
+
+
+def test_generate_checkpoints_by_time(sandbox, cloneable_with_commits):
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    with mock.patch.object(
+            WriteableDatabaseLogic, 'checkpoint',
+            autospec=True, side_effect=WriteableDatabaseLogic.checkpoint,
+    ) as checkpoint:
+        assert not main(('-C', cfg, '--checkpoint-seconds', '0'))
+    shas = [args[1] for args, _ in checkpoint.call_args_list]
+    # After each commit and at the end
+    assert shas == [c.sha for c in cloneable_with_commits.commits] + [
+        cloneable_with_commits.commits[-1].sha,
+    ]
+
+
+def test_generate_rollups_match_backfill(sandbox, cloneable_with_commits):
+    cfg = sandbox.gen_config(repo=cloneable_with_commits.path)
+    assert not main(('-C', cfg))
+    query = (
+        'SELECT period, bucket, metric_id, min_value, max_value, running_value\n'
+        'FROM metric_rollups\n'
+    )
+    with sandbox.db_logic(writeable=True) as db_logic:
+        generated = {row[:3]: row[3:] for row in db_logic._fetch_all(query)}
+        # Backfill the rollups from metric_data as an existing database would
+        db_logic._db.executescript(
+            'DROP TABLE metric_rollups;\n'
+            'PRAGMA user_version = 1;\n',
+        )
+        db_logic.migrate()
+        backfilled = {row[:3]: row[3:] for row in db_logic._fetch_all(query)}
+
+    assert generated
+    for key, (min_value, max_value, value) in generated.items():
+        backfilled_min, backfilled_max, backfilled_value = backfilled[key]
+        assert value == backfilled_value
+        # The generated rollups also include the value from before the metric
+        # had data
+        assert min_value <= backfilled_min
+        assert max_value >= backfilled_max
+
+
 def test_get_options_from_config_no_config_file():
     with pytest.raises(SystemExit):
         get_options_from_config('i-dont-exist')
@@ -1,6 +1,10 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import pytest
+
+from git_code_debt.database import get_migrations
+from git_code_debt.database import Metric
 from git_code_debt.discovery import get_metric_parsers
 from git_code_debt.generate import get_metrics_info
 from git_code_debt.repo_parser import Commit
@@ -41,3 +45,298 @@ def test_insert_and_get_metric_values(sandbox):
         fake_metrics = dict.fromkeys(db_logic.get_metric_mapping().values(), 2)
         insert_fake_metrics(db_logic)
         assert fake_metrics == db_logic.get_metric_values('b' * 40)
+
+
+def _count_metric_data(db_logic):
+    # Bypass the flush-before-query of the writeable logic
+    return db_logic._db.execute('SELECT COUNT(*) FROM metric_data').fetchone()[0]
+
+
+def test_inserts_are_buffered_until_flush(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        insert_fake_metrics(db_logic)
+        assert _count_metric_data(db_logic) == 0
+        db_logic.flush()
+        assert _count_metric_data(db_logic) > 0
+
+
+def test_query_flushes_pending_inserts(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        insert_fake_metrics(db_logic)
+        assert db_logic.get_previous_sha() == 'c' * 40
+
+
+def test_flush_batches_rows_per_statement(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        has_data = {metric_id: True}
+        for i in range(3):
+            commit = Commit('{:040}'.format(i), i)
+            db_logic.insert_commit(commit)
+            db_logic.insert_metric_values({metric_id: i}, has_data, commit)
+            db_logic.insert_rollups([('day', 0, metric_id, i, i, i)])
+        # Rows are grouped by statement, not by the calls which made them
+        assert len(db_logic._pending) == 4
+        assert [len(rows) for rows in db_logic._pending.values()] == [3] * 4
+
+
+def test_flush_writes_dependencies_first(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        commit = Commit('a' * 40, 1)
+        # Reads the commit's id, which is inserted by the later call
+        db_logic.insert_metric_snapshot({metric_id: 5}, {metric_id: True}, commit)
+        db_logic.insert_commit(commit)
+        db_logic.flush()
+        assert db_logic._fetch_all(
+            'SELECT commit_id, metric_id, running_value FROM metric_snapshots',
+        ) == [(db_logic._get_commit_id(commit.sha), metric_id, 5)]
+
+
+def test_execute_flushes_pending_inserts(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        insert_fake_metrics(db_logic)
+        db_logic._execute('DELETE FROM metric_data', ())
+        # The inserts were written before the delete
+        db_logic.flush()
+        assert _count_metric_data(db_logic) == 0
+
+
+def test_exit_flushes_pending_inserts(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        insert_fake_metrics(db_logic)
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() == 'c' * 40
+
+
+def test_exit_with_exception_discards_pending_inserts(sandbox):
+    with pytest.raises(ValueError):
+        with sandbox.db_logic(writeable=True) as db_logic:
+            insert_fake_metrics(db_logic)
+            raise ValueError
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() is None
+
+
+def test_commit_persists_transaction(sandbox):
+    with pytest.raises(ValueError):
+        with sandbox.db_logic(writeable=True) as db_logic:
+            insert_fake_metrics(db_logic)
+            db_logic.commit()
+            raise ValueError
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_previous_sha() == 'c' * 40
+
+
+def test_set_pragma(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic.set_pragma('synchronous', 'off')
+        assert db_logic._fetch_one('PRAGMA synchronous') == (0,)
+
+
+def test_storage_mode_default(sandbox):
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.storage_mode == 'full'
+
+
+def test_storage_mode_without_metadata_table(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic._execute('DROP TABLE metadata', ())
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.storage_mode == 'full'
+
+
+def test_set_storage_mode(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic.set_storage_mode('sparse')
+        assert db_logic.storage_mode == 'sparse'
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.storage_mode == 'sparse'
+
+
+def test_sparse_values_unknown_sha(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic.set_storage_mode('sparse')
+        assert db_logic.get_metric_values('d' * 40) == {}
+        assert db_logic.get_metrics_for_sha('d' * 40) == {}
+
+
+def test_snapshot_values_unknown_sha(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic.set_storage_mode('snapshot')
+        assert db_logic.get_metric_values('d' * 40) == {}
+        assert db_logic.get_metrics_for_sha('d' * 40) == {}
+        assert db_logic.get_commit_count() == 0
+
+
+def test_metrics_for_dates(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        has_data = {metric_id: True}
+        for value, (sha_part, timestamp) in enumerate(
+                (('a', 10), ('b', 20), ('c', 20), ('d', 30)), 1,
+        ):
+            db_logic.insert_metric_values(
+                {metric_id: value}, has_data, Commit(sha_part * 40, timestamp),
+            )
+
+        ret = db_logic.metrics_for_dates(metric_id, [5, 10, 11, 25, 35, 21])
+        assert ret == [
+            Metric(0, 5), Metric(0, 10), Metric(1, 10),
+            Metric(3, 20), Metric(4, 30), Metric(3, 20),
+        ]
+        # Only the last row before the first date is needed
+        assert db_logic.metrics_for_dates(metric_id, [21, 25]) == [
+            Metric(3, 20), Metric(3, 20),
+        ]
+
+
+def test_metrics_for_dates_no_dates(sandbox):
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.metrics_for_dates(1, []) == []
+
+
+def _index_names(db_logic):
+    results = db_logic._fetch_all(
+        "SELECT name FROM sqlite_master WHERE type = 'index'",
+    )
+    return {name for name, in results}
+
+
+def test_get_migrations():
+    versions = [version for version, _ in get_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_create_schema_applies_migrations(sandbox):
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_schema_version() == get_migrations()[-1][0]
+        assert (
+            'metric_data__metric_id_timestamp_value_idx' in
+            _index_names(db_logic)
+        )
+
+
+def test_migrate_existing_database(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        # Make the database look like one from before the migrations
+        db_logic._db.executescript(
+            'DROP INDEX metric_data__metric_id_timestamp_value_idx;\n'
+            'DROP INDEX metric_data__metric_id_idx;\n'
+            'DROP INDEX metric_changes__metric_id_idx;\n'
+            'PRAGMA user_version = 0;\n',
+        )
+        insert_fake_metrics(db_logic)
+        db_logic.commit()
+
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.is_schema_outdated()
+
+    with sandbox.db_logic(writeable=True) as db_logic:
+        db_logic.migrate()
+        # Migrating again is a noop
+        db_logic.migrate()
+
+    with sandbox.db_logic() as db_logic:
+        assert not db_logic.is_schema_outdated()
+        assert db_logic.get_schema_version() == get_migrations()[-1][0]
+        assert {
+            'metric_data__metric_id_timestamp_value_idx',
+            'metric_data__metric_id_idx',
+            'metric_changes__metric_id_idx',
+        } <= _index_names(db_logic)
+        assert db_logic.get_previous_sha() == 'c' * 40
+
+
+def test_get_metric_series(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        has_data = {metric_id: True}
+        for value, (sha_part, timestamp) in enumerate(
+                (('a', 10), ('b', 20), ('c', 30)), 1,
+        ):
+            db_logic.insert_metric_values(
+                {metric_id: value}, has_data, Commit(sha_part * 40, timestamp),
+            )
+
+        assert db_logic.get_metric_series(metric_id, 15, 30) == [
+            Metric(1, 10), Metric(2, 20),
+        ]
+        assert db_logic.get_metric_series(metric_id, 0, 5) == []
+
+
+def test_get_metric_series_commits_with_the_same_timestamp(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        has_data = {metric_id: True}
+        for value, sha_part in ((2, 'a'), (1, 'b')):
+            db_logic.insert_metric_values(
+                {metric_id: value}, has_data, Commit(sha_part * 40, 10),
+            )
+
+        # The latest of the rows before the start is its value
+        assert db_logic.get_metric_series(metric_id, 15, 30) == [Metric(1, 10)]
+        assert db_logic.metrics_for_dates(metric_id, [15, 20]) == [
+            Metric(1, 10), Metric(1, 10),
+        ]
+
+
+def test_insert_rollups_merges_buckets(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        db_logic.insert_rollups([
+            ('day', 0, metric_id, 3, 3, 3),
+            ('day', 0, metric_id, 1, 3, 1),
+            ('day', 86400, metric_id, 2, 2, 2),
+        ])
+        db_logic.insert_rollups([('day', 0, metric_id, 1, 5, 4)])
+        results = db_logic._fetch_all(
+            'SELECT bucket, min_value, max_value, running_value\n'
+            'FROM metric_rollups\n'
+            'ORDER BY bucket\n',
+        )
+        assert results == [(0, 1, 5, 4), (86400, 2, 2, 2)]
+
+
+def test_rollup_reads(sandbox):
+    with sandbox.db_logic(writeable=True) as db_logic:
+        metric_id = db_logic.get_metric_mapping()['TotalLinesOfCode']
+        db_logic.update_has_data([(metric_id, 1)], {metric_id: False})
+        has_data = {metric_id: True}
+        for i, (value, timestamp) in enumerate((
+                (1, 50), (3, 80), (2, 100),
+                (0, 86410), (5, 86420), (4, 86430),
+                (4, 2 * 86400 + 5), (7, 2 * 86400 + 50),
+        )):
+            db_logic.insert_metric_values(
+                {metric_id: value}, has_data, Commit('{:040}'.format(i), timestamp),
+            )
+        db_logic.insert_rollups([
+            ('day', 0, metric_id, 1, 3, 2),
+            ('day', 86400, metric_id, 0, 5, 4),
+            ('day', 2 * 86400, metric_id, 4, 7, 7),
+        ])
+
+        # The buckets partly in the range are read from the raw data
+        assert db_logic.get_metric_series(
+            metric_id, 90, 2 * 86400 + 10, period='day',
+        ) == [
+            Metric(3, 80), Metric(2, 100),
+            Metric(0, 86400 + 43200), Metric(5, 86400 + 43200),
+            Metric(4, 2 * 86400 - 1),
+            Metric(4, 2 * 86400 + 5),
+        ]
+        # A range inside of a bucket
+        assert db_logic.get_metric_series(
+            metric_id, 86415, 86425, period='day',
+        ) == [Metric(0, 86410), Metric(5, 86420)]
+
+
+def test_get_metrics_for_sha_no_sha(sandbox):
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_metrics_for_sha(None) == {}
+
+
+def test_get_metrics_for_times_no_data(sandbox):
+    with sandbox.db_logic() as db_logic:
+        assert db_logic.get_metrics_for_times([None, 5]) == [{}, {}]
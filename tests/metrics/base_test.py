@@ -1,9 +1,18 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import re
+
+import mock
+import pytest
+
 from git_code_debt.file_diff_stat import FileDiffStat
 from git_code_debt.metric import Metric
+from git_code_debt.metrics.base import _combine_patterns
 from git_code_debt.metrics.base import DiffParserBase
+from git_code_debt.metrics.base import get_line_counter_metrics
+from git_code_debt.metrics.base import is_line_counter
+from git_code_debt.metrics.base import LinePatternCounterBase
 from git_code_debt.metrics.base import MetricInfo
 from git_code_debt.metrics.base import SimpleLineCounterBase
 from git_code_debt.repo_parser import Commit
@@ -50,3 +59,166 @@ def test_simple_base_counter():
 def test_includes_file_by_default():
     counter = SimpleLineCounterBase()
     assert counter.should_include_file(None)
+
+
+class StartsWithA(SimpleLineCounterBase):
+    def line_matches_metric(self, line, file_diff_stat):
+        return line.startswith('a')
+
+
+class PyOnly(SimpleLineCounterBase):
+    def should_include_file(self, file_diff_stat):
+        return file_diff_stat.path.endswith('.py')
+
+    def line_matches_metric(self, line, file_diff_stat):
+        return True
+
+
+class CustomCounter(SimpleLineCounterBase):
+    def get_metrics_from_stat(self, _, file_diff_stats):
+        raise NotImplementedError
+
+
+def test_is_line_counter():
+    assert is_line_counter(StartsWithA())
+    assert not is_line_counter(CustomCounter())
+    assert not is_line_counter(DiffParserBase())
+
+
+def test_get_line_counter_metrics():
+    input_stats = [
+        FileDiffStat('a.py', ['a', 'b', 'ac'], ['ad'], None),
+        FileDiffStat('a.txt', ['a', 'b'], [], None),
+        FileDiffStat('b.txt', ['b'], ['a'], None),
+    ]
+    line_counters = (StartsWithA(), PyOnly())
+    ret = set(get_line_counter_metrics(line_counters, input_stats))
+    assert ret == {Metric('StartsWithA', 1), Metric('PyOnly', 2)}
+    # Same as evaluating each one separately
+    assert ret == {
+        metric
+        for line_counter in line_counters
+        for metric in line_counter.get_metrics_from_stat(
+            Commit.blank, input_stats,
+        )
+    }
+
+
+def test_get_line_counter_metrics_walks_lines_once():
+    class Lines(list):
+        iterations = 0
+
+        def __iter__(self):
+            Lines.iterations += 1
+            return super(Lines, self).__iter__()
+
+    input_stats = [
+        FileDiffStat('a.py', Lines(['a', 'b']), Lines(['c']), None),
+    ]
+    line_counters = (StartsWithA(), PyOnly(), StartsWithA())
+    ret = tuple(get_line_counter_metrics(line_counters, input_stats))
+    assert len(ret) == 3
+    assert Lines.iterations == 2
+
+
+def test_get_line_counter_metrics_no_files_included():
+    input_stats = [FileDiffStat('a.txt', ['a'], [], None)]
+    assert tuple(get_line_counter_metrics((PyOnly(),), input_stats)) == ()
+
+
+class FooInPy(LinePatternCounterBase):
+    pattern = b'foo'
+    file_pattern = br'\.py$'
+
+
+class BarOrBaz(LinePatternCounterBase):
+    pattern = re.compile(b'ba[rz]')
+
+
+class NotReallyAPattern(LinePatternCounterBase):
+    pattern = b'foo'
+
+    def line_matches_metric(self, line, file_diff_stat):
+        return b'bar' in line
+
+
+def test_line_pattern_counter():
+    counter = FooInPy()
+    assert counter.should_include_file(FileDiffStat(b'a.py', [], [], None))
+    assert not counter.should_include_file(FileDiffStat(b'a.c', [], [], None))
+    assert counter.line_matches_metric(b'# foo', None)
+    assert not counter.line_matches_metric(b'# bar', None)
+
+
+def test_line_pattern_counter_patterns_compiled_once_per_class():
+    class Foo(FooInPy):
+        pass
+
+    with mock.patch.object(re, 'compile', wraps=re.compile) as compile_mock:
+        for counter in (Foo(), Foo()):
+            counter.should_include_file(FileDiffStat(b'a.py', [], [], None))
+            counter.line_matches_metric(b'# foo', None)
+    assert compile_mock.call_count == 2
+    assert Foo().compiled_pattern is Foo().compiled_pattern
+
+
+def test_line_pattern_counter_includes_file_by_default():
+    assert BarOrBaz().should_include_file(FileDiffStat(b'a.c', [], [], None))
+
+
+def test_get_line_counter_metrics_patterns():
+    input_stats = [
+        FileDiffStat(b'a.py', [b'foo', b'bar', b'foobaz', b'x'], [b'baz'], None),
+        FileDiffStat(b'a.c', [b'foo', b'bar', b'baz'], [b'foo bar'], None),
+    ]
+    line_counters = (FooInPy(), BarOrBaz(), NotReallyAPattern())
+    ret = set(get_line_counter_metrics(line_counters, input_stats))
+    assert ret == {
+        Metric('FooInPy', 2), Metric('BarOrBaz', 2),
+        Metric('NotReallyAPattern', 1),
+    }
+    # Same as evaluating each one separately
+    assert ret == {
+        metric
+        for line_counter in line_counters
+        for metric in line_counter.get_metrics_from_stat(
+            Commit.blank, input_stats,
+        )
+    }
+
+
+@pytest.mark.parametrize(
+    'patterns',
+    (
+        # Nothing to combine
+        (b'foo',),
+        # Differing flags
+        (re.compile(b'foo'), re.compile(b'bar', re.IGNORECASE)),
+        # Backreferences would be renumbered
+        (b'(a)', br'(b)\1'),
+        (b'(?P<x>a)', b'(?P<y>b)(?P=y)'),
+        # Group names conflict
+        (b'(?P<x>a)', b'(?P<x>b)'),
+    ),
+)
+def test_combine_patterns_not_combined(patterns):
+    assert _combine_patterns([re.compile(p) for p in patterns]) is None
+
+
+def test_combine_patterns():
+    ret = _combine_patterns([re.compile(b'fo+'), re.compile(b'(a|b)r')])
+    assert ret.search(b'xfoo')
+    assert ret.search(b'br')
+    assert not ret.search(b'fr')
+
+
+def test_get_line_counter_metrics_uncombined_patterns():
+    class A(LinePatternCounterBase):
+        pattern = b'(?P<x>a)'
+
+    class B(LinePatternCounterBase):
+        pattern = b'(?P<x>b)'
+
+    input_stats = [FileDiffStat(b'f', [b'a', b'b', b'ab'], [], None)]
+    ret = set(get_line_counter_metrics((A(), B()), input_stats))
+    assert ret == {Metric('A', 2), Metric('B', 2)}
@@ -0,0 +1,34 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+
+from git_code_debt.metrics import common
+from git_code_debt.metrics.common import tags_from_filename
+from git_code_debt.metrics.common import UNKNOWN
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    common.TAGS_CACHE.clear()
+    yield
+    common.TAGS_CACHE.clear()
+
+
+def test_tags_from_filename():
+    assert 'python' in tags_from_filename(b'foo.py')
+
+
+def test_tags_from_filename_unknown():
+    assert tags_from_filename(b'herpderp') == {UNKNOWN}
+
+
+def test_tags_from_filename_cached():
+    with mock.patch.object(
+            common.identify, 'tags_from_filename',
+            return_value={'python'},
+    ) as tags_mock:
+        assert tags_from_filename(b'foo.py') == {'python'}
+        assert tags_from_filename(b'foo.py') == {'python'}
+    assert tags_mock.call_count == 1
@@ -8,6 +8,8 @@ import pytest
 import six
 
 from git_code_debt import repo_parser
+from git_code_debt.file_diff_stat import get_file_diff_stats_from_output
+from git_code_debt.util.subprocess import CalledProcessError
 from testing.utilities.auto_namedtuple import auto_namedtuple
 
 
@@ -47,8 +49,9 @@ def test_get_commits_all_of_them(checked_out_repo):
 
 
 def test_get_commits_after_date(checked_out_repo):
+    # `get_commit` reads the starting commit from the repository
+    previous_sha = checked_out_repo.cloneable_with_commits.commits[0].sha
     with mock.patch.object(repo_parser, 'cmd_output') as cmd_output_mock:
-        previous_sha = '29d0d321f43950fd2aa1d1df9fc81dee0e9046b3'
         commit = repo_parser.Commit(previous_sha, 123)
         cmd_output_mock.return_value = '\n'.join(
             six.text_type(part) for part in commit
@@ -74,3 +77,83 @@ def test_get_commit(checked_out_repo):
     sha = first_commit.sha
     ret = checked_out_repo.repo_parser.get_commit(sha)
     assert ret == first_commit
+
+
+def test_get_commit_diffs(checked_out_repo):
+    parser = checked_out_repo.repo_parser
+    expected_commits = checked_out_repo.cloneable_with_commits.commits
+    commit_diffs = tuple(parser.get_commit_diffs())
+
+    assert [commit for commit, _ in commit_diffs] == expected_commits
+    for i, (commit, diff) in enumerate(commit_diffs):
+        # The initial commit is diffed against nothing
+        if i == 0:
+            expected = parser.get_original_commit(commit.sha)
+        else:
+            expected = parser.get_commit_diff(
+                expected_commits[i - 1].sha, commit.sha,
+            )
+        assert (
+            get_file_diff_stats_from_output(diff) ==
+            get_file_diff_stats_from_output(expected)
+        )
+
+
+def test_get_commit_diffs_since_sha(checked_out_repo):
+    parser = checked_out_repo.repo_parser
+    commits = checked_out_repo.cloneable_with_commits.commits
+    commit_diffs = tuple(parser.get_commit_diffs(commits[2].sha))
+    assert [commit for commit, _ in commit_diffs] == commits[3:]
+
+
+def test_get_commit_diffs_up_to_date(checked_out_repo):
+    parser = checked_out_repo.repo_parser
+    head = checked_out_repo.cloneable_with_commits.commits[-1]
+    assert tuple(parser.get_commit_diffs(head.sha)) == ()
+
+
+def test_get_commit_by_ref(checked_out_repo):
+    head = checked_out_repo.cloneable_with_commits.commits[-1]
+    assert checked_out_repo.repo_parser.get_commit('HEAD') == head
+
+
+def test_get_commit_missing(checked_out_repo):
+    with pytest.raises(CalledProcessError):
+        checked_out_repo.repo_parser.get_commit('0' * 40)
+    # The batch process is still usable afterwards
+    test_get_commit(checked_out_repo)
+
+
+def test_get_commit_missing_message(checked_out_repo):
+    with pytest.raises(CalledProcessError) as excinfo:
+        checked_out_repo.repo_parser.get_commit('0' * 40)
+    assert str(excinfo.value) == '{0}^{{commit}}: {0}^{{commit}} missing'.format(
+        '0' * 40,
+    )
+
+
+def test_get_commit_diff_resolves_revisions(checked_out_repo):
+    parser = checked_out_repo.repo_parser
+    commits = checked_out_repo.cloneable_with_commits.commits
+    assert parser.get_commit_diff('HEAD^', 'HEAD') == parser.get_commit_diff(
+        commits[-2].sha, commits[-1].sha,
+    )
+    assert parser.get_original_commit(commits[0].sha[:7]) == (
+        parser.get_original_commit(commits[0].sha)
+    )
+
+
+def test_get_commit_diff_restarts_dead_process(checked_out_repo):
+    parser = checked_out_repo.repo_parser
+    commits = checked_out_repo.cloneable_with_commits.commits
+    # diff-tree exits when given an object which does not exist
+    with pytest.raises(CalledProcessError):
+        parser.get_commit_diff('0' * 40, commits[-1].sha)
+    diff = parser.get_commit_diff(commits[-2].sha, commits[-1].sha)
+    assert diff.startswith(b'diff --git a/foo.tmpl b/foo.tmpl\n')
+
+
+def test_get_commit_diff_empty(checked_out_repo):
+    first_commit = checked_out_repo.cloneable_with_commits.commits[0]
+    parser = checked_out_repo.repo_parser
+    assert parser.get_original_commit(first_commit.sha) == b''
@@ -1,8 +1,18 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import flask
+import mock
+
+from git_code_debt.database import DatabaseLogic
+from git_code_debt.generate import main as generate_main
+from git_code_debt.server.app import AppContext
 from git_code_debt.server.app import create_metric_config_if_not_exists
 from git_code_debt.server.app import main
+from git_code_debt.server.servlets import index as index_servlet
+from git_code_debt.util.subprocess import cmd_output
+from testing.assertions.response import assert_no_response_errors
+from testing.utilities.cwd import cwd
 
 
 def test_file_does_not_exist():
@@ -24,3 +34,83 @@ def test_create_metric_config_if_not_exists_not_existing(tmpdir):
     with tmpdir.as_cwd():
         create_metric_config_if_not_exists()
     assert tmpdir.join('metric_config.yaml').exists()
+
+
+def test_pages_are_cached_until_new_data(server_with_data):
+    client = server_with_data.server.client
+    sha = server_with_data.cloneable_with_commits.commits[-1].sha
+    url = flask.url_for('commit.show', sha=sha)
+    resp = client.get(url)
+    assert_no_response_errors(resp)
+    assert len(AppContext.response_cache) == 1
+
+    with mock.patch.object(
+            DatabaseLogic, 'get_metric_changes',
+            side_effect=AssertionError('should be cached'),
+    ):
+        cached_resp = client.get(url)
+    assert_no_response_errors(cached_resp)
+    assert cached_resp.text == resp.text
+    assert cached_resp.response.headers == resp.response.headers
+
+    # New data invalidates the cache
+    cloneable = server_with_data.cloneable_with_commits.path
+    with cwd(cloneable):
+        cmd_output('git', 'commit', '--allow-empty', '-m', 'new')
+    generate_main(('-C', server_with_data.server.sandbox.gen_config(
+        repo=cloneable,
+    )))
+    with mock.patch.object(
+            DatabaseLogic, 'get_metric_changes', return_value=[],
+    ) as get_metric_changes:
+        assert_no_response_errors(client.get(url))
+    assert get_metric_changes.called
+    assert len(AppContext.response_cache) == 2
+
+
+def test_uncached_pages(server):
+    resp = server.client.get(flask.url_for('status.healthcheck'))
+    assert_no_response_errors(resp)
+    assert len(AppContext.response_cache) == 0
+
+
+def test_error_responses_are_not_cached(server):
+    with mock.patch.object(
+            index_servlet, 'render_template', return_value=('oops', 500),
+    ):
+        resp = server.client.get(flask.url_for('index.show'))
+    assert resp.response.status_code == 500
+    assert len(AppContext.response_cache) == 0
+
+
+def test_conditional_requests(server_with_data):
+    client = server_with_data.server.client
+    url = flask.url_for('index.show')
+    resp = client.get(url)
+    assert_no_response_errors(resp)
+    etag = resp.response.headers['ETag']
+    assert resp.response.cache_control.no_cache
+
+    with mock.patch.object(
+            DatabaseLogic, 'get_metrics_for_times',
+            side_effect=AssertionError('should not be rendered'),
+    ):
+        not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.response.status_code == 304
+    assert not_modified.response.headers['ETag'] == etag
+    assert not_modified.response.data == b''
+
+    # Another page or config has a different ETag
+    other = client.get(flask.url_for('index.show', foo='bar'))
+    assert other.response.headers['ETag'] != etag
+    with mock.patch.object(AppContext, 'config_version', 'changed'):
+        resp = client.get(url, headers={'If-None-Match': etag})
+    assert resp.response.status_code == 200
+    assert resp.response.headers['ETag'] != etag
+
+
+def test_cached_responses_have_etag(server_with_data):
+    client = server_with_data.server.client
+    url = flask.url_for('index.show')
+    etag = client.get(url).response.headers['ETag']
+    assert client.get(url).response.headers['ETag'] == etag
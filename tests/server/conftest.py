@@ -9,7 +9,10 @@ import pytest
 from git_code_debt.generate import main
 from git_code_debt.server.app import app
 from git_code_debt.server.app import AppContext
+from git_code_debt.server.app import DEFAULT_CACHE_SIZE
+from git_code_debt.server.connection_pool import ConnectionPool
 from git_code_debt.server.metric_config import Config
+from git_code_debt.util.lru import LRUCache
 from testing.utilities.auto_namedtuple import auto_namedtuple
 from testing.utilities.client import Client
 
@@ -47,8 +50,13 @@ def server(sandbox):
                 'CommitLinks': {},
                 'WidgetMetrics': {},
             })
-            with mock.patch.object(AppContext, 'config', config):
+            cache = LRUCache(maxsize=DEFAULT_CACHE_SIZE)
+            pool = ConnectionPool(sandbox.db_path)
+            with mock.patch.object(AppContext, 'config', config), \
+                    mock.patch.object(AppContext, 'response_cache', cache), \
+                    mock.patch.object(AppContext, 'connection_pool', pool):
                 yield GitCodeDebtServer(client, sandbox)
+            pool.close()
 
 
 @pytest.fixture
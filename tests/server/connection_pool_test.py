@@ -0,0 +1,68 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import sqlite3
+
+import mock
+import pytest
+
+from git_code_debt.database import DatabaseLogic
+from git_code_debt.server.connection_pool import connect_readonly
+from git_code_debt.server.connection_pool import ConnectionPool
+
+
+def test_connect_readonly(sandbox):
+    db_logic = DatabaseLogic(connect_readonly(sandbox.db_path))
+    assert db_logic.get_metric_mapping()
+    with pytest.raises(sqlite3.OperationalError):
+        db_logic._db.execute('DELETE FROM metric_names')
+    db_logic.close()
+
+
+def test_connect_readonly_immutable_with_pragmas(sandbox):
+    db = connect_readonly(
+        sandbox.db_path, immutable=True, pragmas=(('cache_size', -1024),),
+    )
+    assert db.execute('PRAGMA cache_size').fetchone() == (-1024,)
+    assert db.execute('SELECT COUNT(*) FROM metric_names').fetchone()[0]
+    db.close()
+
+
+def test_connection_pool_reuses_connections(sandbox):
+    pool = ConnectionPool(sandbox.db_path, mmap_size=2 ** 20, cache_size=500)
+    db = pool.acquire()
+    assert db.execute('PRAGMA cache_size').fetchone() == (500,)
+    pool.release(db)
+    assert pool.acquire() is db
+    assert pool.acquire() is not db
+    pool.close()
+
+
+def test_connection_pool_max_idle(sandbox):
+    pool = ConnectionPool(sandbox.db_path, max_idle=1)
+    db1, db2 = pool.acquire(), pool.acquire()
+    pool.release(db1)
+    pool.release(db2)
+    # The extra connection is closed
+    with pytest.raises(sqlite3.ProgrammingError):
+        db2.execute('SELECT 1')
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        db1.execute('SELECT 1')
+
+
+def test_connection_pool_not_shared_after_fork(sandbox):
+    pool = ConnectionPool(sandbox.db_path)
+    db1, db2 = pool.acquire(), pool.acquire()
+    pool.release(db1)
+    with mock.patch.object(os, 'getpid', return_value=-1):
+        # Connections are closed rather than pooled in the forked process
+        pool.release(db2)
+        with pytest.raises(sqlite3.ProgrammingError):
+            db2.execute('SELECT 1')
+        # Connections from before the fork are not reused
+        db3 = pool.acquire()
+        assert db3 is not db1
+        pool.release(db3)
+        assert pool.acquire() is db3
@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-from git_code_debt.metric import Metric
 from git_code_debt.repo_parser import Commit
 
 
@@ -22,8 +21,7 @@ def insert(db_logic, sha, timestamp, value, has_data=True):
 def insert_metric_changes(db_logic, sha, change):
     metric_mapping = db_logic.get_metric_mapping()
     db_logic.insert_metric_changes(
-        [Metric('PythonImportCount', change)],
-        metric_mapping,
+        [(metric_mapping['PythonImportCount'], change)],
         Commit(sha, None),
     )
 
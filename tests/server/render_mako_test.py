@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+
+import mock
+
+from git_code_debt.server import render_mako
+
+
+def test_preload_templates():
+    lookup = render_mako.get_template_lookup()
+    with mock.patch.object(render_mako, 'template_lookup', lookup):
+        render_mako.preload_templates()
+        assert render_mako.template_lookup is lookup
+        assert lookup.has_template('index.mako')
+        with mock.patch.object(
+                lookup, '_load', side_effect=AssertionError('compiled'),
+        ):
+            assert render_mako.render_template('widget_frame.mako')
+
+
+def test_preload_templates_module_directory(tmpdir):
+    module_directory = tmpdir.join('templates').strpath
+    with mock.patch.object(render_mako, 'template_lookup'):
+        render_mako.preload_templates(module_directory)
+        lookup = render_mako.template_lookup
+        assert lookup.template_args['module_directory'] == module_directory
+        assert render_mako.render_template('widget_frame.mako')
+    assert any(
+        filename.startswith('index.mako')
+        for filename in os.listdir(module_directory)
+    )
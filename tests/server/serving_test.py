@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import contextlib
+import multiprocessing.pool
+import os
+import threading
+
+import flask
+import mock
+import pytest
+from six.moves.urllib.request import urlopen
+
+from git_code_debt.server.app import app
+from git_code_debt.server.app import AppContext
+from git_code_debt.server.serving import serve
+from git_code_debt.server.serving import ThreadPoolWSGIServer
+from git_code_debt.server.servlets import index
+
+
+@contextlib.contextmanager
+def _serving(threads):
+    wsgi_server = ThreadPoolWSGIServer('127.0.0.1', 0, app, threads)
+    thread = threading.Thread(target=serve, args=(wsgi_server, 1))
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:{}'.format(wsgi_server.server_address[1])
+    finally:
+        wsgi_server.shutdown()
+        thread.join()
+
+
+def test_thread_pool_server(server_with_data):
+    with _serving(threads=2) as base_url:
+        def get(path):
+            resp = urlopen(base_url + path)
+            return resp.getcode(), resp.read()
+
+        paths = (
+            flask.url_for('index.show'), flask.url_for('status.healthcheck'),
+        )
+        with contextlib.closing(multiprocessing.pool.ThreadPool(4)) as pool:
+            results = pool.map(get, paths * 2)
+
+    index1, health1, index2, health2 = results
+    assert index1 == index2
+    assert index1[0] == 200
+    assert health1 == health2 == (200, b'')
+
+
+def test_thread_pool_server_uses_response_cache(server_with_data):
+    with mock.patch.object(
+            index, 'render_template', wraps=index.render_template,
+    ) as render_template:
+        with _serving(threads=2) as base_url:
+            resp1 = urlopen(base_url + flask.url_for('index.show'))
+            resp2 = urlopen(base_url + flask.url_for('index.show'))
+            assert resp1.read() == resp2.read()
+    # The second request is served from the cache, without rendering
+    assert render_template.call_count == 1
+    assert len(AppContext.response_cache) == 1
+
+
+def test_thread_pool_server_request_error(server):
+    with mock.patch.object(
+            ThreadPoolWSGIServer, 'finish_request', side_effect=ValueError,
+    ), mock.patch.object(ThreadPoolWSGIServer, 'handle_error') as handle_error:
+        with _serving(threads=1) as base_url:
+            # The connection is closed without a response
+            with pytest.raises(Exception):
+                urlopen(base_url + '/')
+    assert handle_error.called
+
+
+def test_serve_forks_workers():
+    wsgi_server = mock.Mock()
+    with mock.patch.object(os, 'fork', side_effect=(1, 2)), \
+            mock.patch.object(os, 'waitpid') as waitpid:
+        serve(wsgi_server, 2)
+    assert waitpid.call_args_list == [mock.call(1, 0), mock.call(2, 0)]
+    # The workers accept requests, not the parent
+    assert not wsgi_server.serve_forever.called
+    assert wsgi_server.socket.close.called
+
+
+def test_serve_interrupted():
+    wsgi_server = mock.Mock()
+    with mock.patch.object(os, 'fork', side_effect=(1, 2)), \
+            mock.patch.object(os, 'waitpid', side_effect=KeyboardInterrupt):
+        serve(wsgi_server, 2)
@@ -1,13 +1,20 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import json
+import re
+
 import flask
 import mock
+import pytest
 import six
 
+from git_code_debt.database import DatabaseLogic
+from git_code_debt.database import Metric
 from git_code_debt.metrics.binary_file_count import BinaryFileCount
 from git_code_debt.metrics.imports import PythonImportCount
 from git_code_debt.metrics.symlink_count import SymlinkCount
+from git_code_debt.server.servlets import graph
 from testing.assertions.response import assert_no_response_errors
 from testing.assertions.response import assert_redirect
 
@@ -111,3 +118,83 @@ def test_renders_description(server):
     assert desc.text() == expected
     # should have formatted the markdown
     assert desc.find('code')
+
+
+def _get_metrics(resp):
+    match = re.search(r'metrics = (.*);', resp.text)
+    return json.loads(match.group(1))
+
+
+def test_show_points(server_with_data):
+    commits = server_with_data.cloneable_with_commits.commits
+    resp = server_with_data.server.client.get(
+        flask.url_for(
+            'graph.show',
+            metric_name='TotalLinesOfCode',
+            start=six.text_type(commits[0].date - 1000),
+            end=six.text_type(commits[-1].date + 1000),
+            points='5',
+        ),
+    )
+    assert_no_response_errors(resp)
+    metrics = _get_metrics(resp)
+    assert len(metrics) <= 5
+    # Starts at 0 and ends with the final value
+    assert metrics[0] == [(commits[0].date - 1000) * 1000, 0]
+    assert metrics[-1] == [(commits[-1].date + 1000) * 1000, 4]
+
+
+def _get_show_with_points(server, points):
+    return server.client.get(
+        flask.url_for(
+            'graph.show',
+            metric_name='TotalLinesOfCode',
+            start='0',
+            end='1000',
+            points=points,
+        ),
+    )
+
+
+@pytest.mark.parametrize('points', ('abc', '0', '-5'))
+def test_show_invalid_points(server_with_data, points):
+    resp = _get_show_with_points(server_with_data.server, points)
+    assert resp.response.status_code == 400
+
+
+@pytest.mark.parametrize(('points', 'expected'), (('1', 2), ('9999999', 5000)))
+def test_show_points_clamped(server_with_data, points, expected):
+    with mock.patch.object(graph, 'downsample', return_value=[]) as downsample:
+        resp = _get_show_with_points(server_with_data.server, points)
+    assert_no_response_errors(resp)
+    assert downsample.call_args[0][3] == expected
+
+
+def test_show_sparse_series_is_drawn_as_steps(server_with_data):
+    series = [Metric(1, 100), Metric(2, 500)]
+    with mock.patch.object(
+            DatabaseLogic, 'get_metric_series', return_value=series,
+    ):
+        resp = _get_show_with_points(server_with_data.server, '250')
+    assert_no_response_errors(resp)
+    assert _get_metrics(resp) == [
+        [0, 0], [100000, 0], [100000, 1], [500000, 1], [500000, 2],
+        [1000000, 2],
+    ]
+
+
+def test_show_long_range_uses_rollups(server_with_data):
+    commits = server_with_data.cloneable_with_commits.commits
+    end = commits[-1].date + 1000
+    resp = server_with_data.server.client.get(
+        flask.url_for(
+            'graph.show',
+            metric_name='TotalLinesOfCode',
+            start='0',
+            end=six.text_type(end),
+        ),
+    )
+    assert_no_response_errors(resp)
+    metrics = _get_metrics(resp)
+    assert metrics[0] == [0, 0]
+    assert metrics[-1] == [end * 1000, 4]
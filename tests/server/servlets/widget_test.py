@@ -2,6 +2,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import contextlib
+import os.path
 
 import flask
 import mock
@@ -9,6 +10,8 @@ import pyquery
 
 from git_code_debt.server.app import AppContext
 from git_code_debt.server.metric_config import Config
+from git_code_debt.server.servlets import widget as widget_servlet
+from git_code_debt.server.servlets.widget import WidgetConfigCache
 from testing.assertions.response import assert_no_response_errors
 from tests import file_diff_stat_test
 
@@ -55,3 +58,38 @@ def test_widget_data_multiple_values(server):
         )
     response_pq = pyquery.PyQuery(response.json['metrics'])
     assert 'TotalLinesOfCode_plain-text' in response_pq.text()
+
+
+def test_widget_config_is_cached(server, tmpdir):
+    config_file = tmpdir.join('generate_config.yaml')
+    config_file.write('database: db.db\nrepo: .\nmetric_package_names: []\n')
+    cache = WidgetConfigCache(config_file.strpath)
+    with metrics_enabled({'TotalLinesOfCode': {}}), \
+            mock.patch.object(widget_servlet, 'widget_config', cache), \
+            mock.patch.object(
+                widget_servlet, 'get_metric_parsers_from_args',
+                wraps=widget_servlet.get_metric_parsers_from_args,
+            ) as get_parsers:
+        for _ in range(2):
+            response = server.client.post(
+                flask.url_for('widget.data'),
+                data={'diff': file_diff_stat_test.SAMPLE_OUTPUT},
+            )
+            assert_no_response_errors(response)
+        assert get_parsers.call_count == 1
+
+        # Changing the config loads it again
+        config_file.write(
+            'database: db.db\nrepo: .\nmetric_package_names: []\n'
+            'exclude: ^.*$\n',
+        )
+        mtime = os.path.getmtime(config_file.strpath)
+        os.utime(config_file.strpath, (mtime + 1, mtime + 1))
+        response = server.client.post(
+            flask.url_for('widget.data'),
+            data={'diff': file_diff_stat_test.SAMPLE_OUTPUT},
+        )
+        assert get_parsers.call_count == 2
+    # Every file is excluded now
+    response_pq = pyquery.PyQuery(response.json['metrics'])
+    assert 'TotalLinesOfCode' not in response_pq.text()
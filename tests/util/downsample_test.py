@@ -0,0 +1,63 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+
+from git_code_debt.util.downsample import downsample
+
+
+def test_downsample_no_points():
+    assert downsample([], 0, 100, 250) == [(0, 0), (100, 0)]
+
+
+def test_downsample_empty_range():
+    assert downsample([], 5, 5, 250) == [(5, 0)]
+
+
+def test_downsample_value_before_start():
+    ret = downsample([(-5, 3), (10, 4)], 0, 100, 250)
+    assert ret == [(0, 3), (10, 3), (10, 4), (100, 4)]
+
+
+def test_downsample_keeps_min_max_and_last_of_buckets():
+    points = [(0, 1), (1, 5), (2, 0), (3, 2), (6, 2), (7, 9), (8, 4)]
+    # 2 buckets of width 5
+    ret = downsample(points, 0, 10, 15)
+    assert ret == [
+        (0, 0), (1, 0), (1, 5), (2, 5), (2, 0), (3, 0), (3, 2), (6, 2),
+        (7, 2), (7, 9), (8, 9), (8, 4), (10, 4),
+    ]
+
+
+def test_downsample_sparse_points_are_steps():
+    # Only the changes of the metric, it is constant in between
+    points = [(-5, 1), (30, 2), (31, 2), (80, 5)]
+    assert downsample(points, 0, 100, 250) == [
+        (0, 1), (30, 1), (30, 2), (31, 2), (80, 2), (80, 5), (100, 5),
+    ]
+
+
+def test_downsample_point_budget():
+    points = [(i, i % 7) for i in range(1000)]
+    ret = downsample(points, 0, 1000, 50)
+    assert len(ret) <= 50
+    assert max(value for _, value in ret) == 6
+    assert min(value for _, value in ret) == 0
+
+
+@pytest.mark.parametrize('max_points', range(2, 30))
+def test_downsample_small_point_budgets(max_points):
+    points = [(-1, 2)] + [(i, i % 7) for i in range(100)]
+    ret = downsample(points, 0, 100, max_points)
+    assert len(ret) <= max_points
+    assert ret[0] == (0, 2)
+    assert ret[-1] == (100, 99 % 7)
+
+
+def test_downsample_only_start_and_end_fit():
+    assert downsample([(-1, 2), (5, 3)], 0, 10, 4) == [(0, 2), (10, 3)]
+    assert downsample([(5, 3)], 5, 5, 2) == [(5, 0)]
+
+
+def test_downsample_zero_width_range():
+    assert downsample([(5, 1), (5, 2)], 5, 5, 250) == [(5, 0), (5, 1), (5, 2)]
@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from git_code_debt.util.lru import LRUCache
+
+
+def test_get_missing():
+    cache = LRUCache(2)
+    assert cache.get('a') is None
+    assert cache.get('a', 1) == 1
+
+
+def test_set_and_get():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['a'] = 2
+    assert cache.get('a') == 2
+    assert len(cache) == 1
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    # Using 'a' makes 'b' the least recently used
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_clear():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import contextlib
+import multiprocessing.pool
+import time
+
+import mock
+import pytest
+
+from git_code_debt.util.pipeline import ordered_imap
+from git_code_debt.util.pipeline import prefetch
+
+
+def test_prefetch():
+    assert list(prefetch(iter(range(10)), 3)) == list(range(10))
+
+
+def test_prefetch_empty():
+    assert list(prefetch(iter(()), 1)) == []
+
+
+def test_prefetch_reads_a_bounded_number_ahead():
+    read = []
+
+    def gen():
+        i = 0
+        while True:
+            read.append(i)
+            yield i
+            i += 1
+
+    items = prefetch(gen(), 2)
+    assert next(items) == 0
+    time.sleep(.1)
+    # 2 in the queue and 1 waiting to be put
+    assert len(read) <= 4
+    items.close()
+
+
+def test_prefetch_consumer_stops_early():
+    closed = []
+
+    def gen():
+        try:
+            yield 1
+            # The consumer stops while the next item is being read
+            time.sleep(.3)
+            yield 2
+        finally:
+            closed.append(True)
+
+    items = prefetch(gen(), 1)
+    assert next(items) == 1
+    items.close()
+    assert closed == [True]
+
+
+def test_prefetch_raises_errors():
+    def gen():
+        yield 1
+        raise ValueError('oh no')
+
+    items = prefetch(gen(), 5)
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def square(x):
+    return x * x
+
+
+def test_ordered_imap():
+    with contextlib.closing(multiprocessing.pool.ThreadPool(4)) as pool:
+        ret = list(ordered_imap(pool.apply_async, square, range(20), 3))
+    assert ret == [square(x) for x in range(20)]
+
+
+def test_ordered_imap_bounded():
+    submitted = []
+
+    def apply_async(func, args):
+        submitted.append(args)
+        return mock.Mock(get=mock.Mock(return_value=func(*args)))
+
+    results = ordered_imap(apply_async, square, range(10), 3)
+    assert next(results) == 0
+    assert len(submitted) == 3
+    assert next(results) == 1
+    assert len(submitted) == 4
+    assert list(results) == [square(x) for x in range(2, 10)]
@@ -5,8 +5,10 @@ from __future__ import unicode_literals
 import pytest
 import six
 
+from git_code_debt.util.subprocess import BatchProcess
 from git_code_debt.util.subprocess import CalledProcessError
 from git_code_debt.util.subprocess import cmd_output
+from git_code_debt.util.subprocess import cmd_output_lines
 
 
 def test_subprocess_encoding():
@@ -33,3 +35,60 @@ def test_raises_on_nonzero():
         b'stdout\n',
         b'stderr\n',
     )
+
+
+def test_cmd_output_lines():
+    ret = tuple(cmd_output_lines('printf', 'foo\nbar\n'))
+    assert ret == (b'foo\n', b'bar\n')
+
+
+def test_cmd_output_lines_raises_on_nonzero():
+    cmd = ('sh', '-c', 'echo "stderr" >&2 && echo "stdout" && exit 1')
+    lines = cmd_output_lines(*cmd)
+    assert next(lines) == b'stdout\n'
+    with pytest.raises(CalledProcessError) as exc_info:
+        next(lines)
+
+    assert exc_info.value.args == (cmd, 1, None, b'stderr\n')
+
+
+def test_cmd_output_lines_lots_of_stderr():
+    # More than fits in a pipe's buffer before stdout is finished
+    cmd = ('sh', '-c', 'head -c 1000000 /dev/zero >&2 && echo "stdout"')
+    assert tuple(cmd_output_lines(*cmd)) == (b'stdout\n',)
+
+
+def test_cmd_output_lines_stopped_early():
+    lines = cmd_output_lines('yes')
+    assert next(lines) == b'y\n'
+    # Should not hang waiting for the (infinite) process
+    lines.close()
+
+
+def test_batch_process():
+    proc = BatchProcess('cat')
+    try:
+        proc.write(b'hello\n')
+        assert proc.readline() == b'hello\n'
+        proc.write(b'world')
+        assert proc.read(5) == b'world'
+        assert proc.alive
+    finally:
+        proc.close()
+    assert not proc.alive
+
+
+def test_batch_process_died_reading():
+    proc = BatchProcess('sh', '-c', 'printf foo; exit 1')
+    with pytest.raises(CalledProcessError) as exc_info:
+        proc.read(5)
+    assert exc_info.value.args == (('sh', '-c', 'printf foo; exit 1'), 1, None, None)
+    with pytest.raises(CalledProcessError):
+        proc.readline()
+
+
+def test_batch_process_died_writing():
+    proc = BatchProcess('true')
+    proc._proc.wait()
+    with pytest.raises(CalledProcessError):
+        proc.write(b'x' * 1000000)
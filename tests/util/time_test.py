@@ -3,7 +3,13 @@ from __future__ import unicode_literals
 
 import datetime
 
+import pytest
+
+from git_code_debt.util.time import coarsest_period
 from git_code_debt.util.time import data_points_for_time_range
+from git_code_debt.util.time import DAY
+from git_code_debt.util.time import period_end
+from git_code_debt.util.time import period_start
 from git_code_debt.util.time import to_timestamp
 
 
@@ -21,3 +27,56 @@ def test_data_points_for_time_range():
 def test_data_points_for_time_range_gives_data_for_empty_range():
     ret = data_points_for_time_range(1, 1, 5)
     assert ret == (1,)
+
+
+@pytest.mark.parametrize(
+    ('period', 'expected'),
+    (
+        # 2013-01-02 03:04:05 is a Wednesday
+        ('day', datetime.datetime(2013, 1, 2)),
+        ('week', datetime.datetime(2012, 12, 31)),
+        ('month', datetime.datetime(2013, 1, 1)),
+    ),
+)
+def test_period_start(period, expected):
+    timestamp = to_timestamp(datetime.datetime(2013, 1, 2, 3, 4, 5))
+    assert period_start(period, timestamp) == to_timestamp(expected)
+
+
+def test_period_start_at_start():
+    timestamp = to_timestamp(datetime.datetime(2012, 12, 31))
+    assert period_start('week', timestamp) == timestamp
+
+
+@pytest.mark.parametrize(
+    ('period', 'expected'),
+    (
+        ('day', datetime.datetime(2013, 1, 31)),
+        ('week', datetime.datetime(2013, 2, 4)),
+        ('month', datetime.datetime(2013, 2, 1)),
+    ),
+)
+def test_period_end(period, expected):
+    timestamp = to_timestamp(datetime.datetime(2013, 1, 30, 3, 4, 5))
+    assert period_end(period, timestamp) == to_timestamp(expected)
+
+
+def test_period_end_at_start():
+    timestamp = to_timestamp(datetime.datetime(2013, 1, 1))
+    assert period_end('month', timestamp) == to_timestamp(
+        datetime.datetime(2013, 2, 1),
+    )
+
+
+@pytest.mark.parametrize(
+    ('length', 'expected'),
+    (
+        (60, None),
+        (DAY, 'day'),
+        (3 * DAY, 'day'),
+        (13 * DAY, 'week'),
+        (365 * DAY, 'month'),
+    ),
+)
+def test_coarsest_period(length, expected):
+    assert coarsest_period(length) == expected